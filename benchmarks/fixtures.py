@@ -0,0 +1,387 @@
+"""Synthetic theme files for the benchmarks.
+
+theme_files(scale) returns {filename: contents} for every supported file.
+At scale 1 each file looks like a typical hand-written theme; larger scales
+repeat the colour block (or, for aether.zed.json, add syntax scopes and an
+extra theme entry per 500) to produce stress-sized inputs.
+"""
+
+import json
+import os
+
+SCHEME = """system: "base16"
+name: "Benchmark"
+author: "theme-color-tool"
+variant: "dark"
+palette:
+  base00: "#1d1f21"
+  base01: "#282a2e"
+  base02: "#373b41"
+  base03: "#969896"
+  base04: "#b4b7b4"
+  base05: "#c5c8c6"
+  base06: "#e0e0e0"
+  base07: "#ffffff"
+  base08: "#cc6666"
+  base09: "#de935f"
+  base0A: "#f0c674"
+  base0B: "#b5bd68"
+  base0C: "#8abeb7"
+  base0D: "#81a2be"
+  base0E: "#b294bb"
+  base0F: "#a3685a"
+"""
+
+ANSI_NAMES = ["black", "red", "green", "yellow", "blue", "magenta", "cyan", "white"]
+
+GTK_NAMES = [
+    "background",
+    "foreground",
+    "black",
+    "red",
+    "green",
+    "yellow",
+    "blue",
+    "magenta",
+    "cyan",
+    "white",
+    "bright_black",
+    "bright_red",
+    "bright_green",
+    "bright_yellow",
+    "bright_blue",
+    "bright_magenta",
+    "bright_cyan",
+    "bright_white",
+    "selection_bg",
+    "selection_fg",
+]
+
+BTOP_KEYS = [
+    "main_bg",
+    "main_fg",
+    "title",
+    "hi_fg",
+    "selected_bg",
+    "selected_fg",
+    "inactive_fg",
+    "graph_text",
+    "meter_bg",
+    "proc_misc",
+    "cpu_box",
+    "mem_box",
+    "net_box",
+    "proc_box",
+    "div_line",
+]
+for group in ("temp", "cpu", "free", "cached", "available", "used", "download", "upload"):
+    BTOP_KEYS.extend(f"{group}_{stop}" for stop in ("start", "mid", "end"))
+
+STEAM_KEYS = [
+    f"--adw-{name}-rgb"
+    for name in (
+        "accent-bg",
+        "accent-fg",
+        "accent",
+        "destructive-bg",
+        "destructive-fg",
+        "destructive",
+        "success-bg",
+        "success-fg",
+        "success",
+        "warning-bg",
+        "warning-fg",
+        "warning",
+        "error-bg",
+        "error-fg",
+        "error",
+        "window-bg",
+        "window-fg",
+        "view-bg",
+        "view-fg",
+        "headerbar-bg",
+        "headerbar-fg",
+        "headerbar-border",
+        "headerbar-backdrop",
+        "sidebar-bg",
+        "sidebar-fg",
+        "sidebar-backdrop",
+        "secondary-sidebar-bg",
+        "secondary-sidebar-fg",
+        "secondary-sidebar-backdrop",
+        "card-bg",
+        "card-fg",
+        "dialog-bg",
+        "dialog-fg",
+        "popover-bg",
+        "popover-fg",
+        "thumbnail-bg",
+    )
+]
+
+ZED_STYLE_KEYS = [
+    "border",
+    "border.variant",
+    "elevated_surface.background",
+    "surface.background",
+    "background",
+    "element.background",
+    "element.hover",
+    "element.selected",
+    "drop_target.background",
+    "ghost_element.hover",
+    "ghost_element.selected",
+    "text",
+    "text.muted",
+    "text.placeholder",
+    "text.disabled",
+    "text.accent",
+    "status_bar.background",
+    "title_bar.background",
+    "title_bar.inactive_background",
+    "toolbar.background",
+    "tab_bar.background",
+    "tab.inactive_background",
+    "tab.active_background",
+    "search.match_background",
+    "panel.background",
+    "panel.focused_border",
+    "scrollbar.thumb.background",
+    "scrollbar.thumb.hover_background",
+    "scrollbar.track.background",
+    "editor.foreground",
+    "editor.background",
+    "editor.gutter.background",
+    "editor.subheader.background",
+    "editor.active_line.background",
+    "editor.line_number",
+    "editor.active_line_number",
+    "editor.wrap_guide",
+    "editor.active_wrap_guide",
+    "editor.document_highlight.read_background",
+    "editor.document_highlight.write_background",
+    "terminal.background",
+    "terminal.foreground",
+    "terminal.bright_foreground",
+    "terminal.dim_foreground",
+    "link_text.hover",
+    "conflict",
+    "conflict.background",
+    "conflict.border",
+    "created",
+    "created.background",
+    "created.border",
+    "deleted",
+    "deleted.background",
+    "deleted.border",
+    "error",
+    "error.background",
+    "error.border",
+    "hidden",
+    "hidden.background",
+    "hidden.border",
+    "hint",
+    "hint.background",
+    "hint.border",
+    "ignored",
+    "ignored.background",
+    "ignored.border",
+    "info",
+    "info.background",
+    "info.border",
+    "modified",
+    "modified.background",
+    "modified.border",
+    "predictive",
+    "predictive.background",
+    "predictive.border",
+    "renamed",
+    "renamed.background",
+    "renamed.border",
+    "success",
+    "success.background",
+    "success.border",
+    "unreachable",
+    "unreachable.background",
+    "unreachable.border",
+    "warning",
+    "warning.background",
+    "warning.border",
+    "scrollbar.thumb.border",
+]
+
+ZED_SYNTAX_KEYS = [
+    "attribute",
+    "boolean",
+    "comment",
+    "comment.doc",
+    "constant",
+    "constructor",
+    "emphasis",
+    "emphasis.strong",
+    "function",
+    "keyword",
+    "label",
+    "link_text",
+    "link_uri",
+    "number",
+    "punctuation",
+    "punctuation.bracket",
+    "punctuation.delimiter",
+    "punctuation.list_marker",
+    "punctuation.special",
+    "string",
+    "string.escape",
+    "string.regex",
+    "string.special",
+    "string.special.symbol",
+    "tag",
+    "text.literal",
+    "title",
+    "type",
+    "variable",
+    "variable.special",
+]
+
+FILLER = "# filler line to pad the file out like a real-world config\n"
+
+
+def block(lines, filler=4):
+    return "".join(line + "\n" for line in lines) + FILLER * filler
+
+
+def zed_theme(index, scale):
+    style = {key: "#000000ff" for key in ZED_STYLE_KEYS}
+    for prefix in ("", "bright_"):
+        for name in ANSI_NAMES:
+            style[f"terminal.ansi.{prefix}{name}"] = "#000000"
+    style["players"] = [{"cursor": "#000000", "background": "#000000", "selection": "#00000040"}]
+    syntax = {
+        key: {"color": "#000000", "font_style": None, "font_weight": None}
+        for key in ZED_SYNTAX_KEYS
+    }
+    for n in range(scale - 1):
+        syntax[f"custom.scope_{n}"] = {
+            "color": "#123456",
+            "font_style": "italic",
+            "font_weight": 400,
+        }
+    style["syntax"] = syntax
+    return {"name": f"Aether {index}", "appearance": "dark", "style": style}
+
+
+def theme_files(scale=1):
+    files = {
+        "ghostty.conf": block(
+            ["background = #000000", "foreground = #000000", "cursor-color = #000000"]
+            + [f"palette = {i}=#000000" for i in range(16)]
+        ),
+        "neovim.lua": block(
+            ["return {", "  on_colors = function(c)"]
+            + [
+                f'    c.{key} = "#000000"'
+                for key in (
+                    "bg", "bg_dark", "bg_highlight", "fg", "fg_dark", "comment", "red",
+                    "orange", "yellow", "green", "cyan", "blue", "purple", "magenta",
+                )
+            ]
+            + ["  end,", "}"],
+        ),
+        "alacritty.toml": block(
+            ["[colors.primary]", 'background = "#000000"', 'foreground = "#000000"', ""]
+            + ["[colors.cursor]", 'text = "#000000"', 'cursor = "#000000"', ""]
+            + ["[colors.normal]"] + [f'{name} = "#000000"' for name in ANSI_NAMES] + [""]
+            + ["[colors.bright]"] + [f'{name} = "#000000"' for name in ANSI_NAMES] + [""]
+        ),
+        "kitty.conf": block(
+            ["background #000000", "foreground #000000", "selection_background #000000"]
+            + [f"color{i} #000000" for i in range(16)]
+        ),
+        "warp.yaml": block(
+            ["accent: '#000000'", "cursor: '#000000'", "background: '#000000'"]
+            + ["foreground: '#000000'", "details: darker", "terminal_colors:", "  normal:"]
+            + [f"    {name}: '#000000'" for name in ANSI_NAMES]
+            + ["  bright:"]
+            + [f"    {name}: '#000000'" for name in ANSI_NAMES],
+            filler=0,
+        ),
+        "colors.fish": block(
+            [f"set -U {key} '#000000'" for key in ("background", "foreground", "cursor")]
+            + [f"set -U color{i} '#000000'" for i in range(16)]
+        ),
+        "fzf.fish": block([f"set -l color{i:02X} '#000000'" for i in range(16)]),
+        "vencord.theme.css": block(
+            [":root {"] + [f"  --color{i:02d}: #000000;" for i in range(16)] + ["}"]
+        ),
+        "hyprland.conf": block(
+            ["$activeBorderColor = rgb(000000)", "general {", "    gaps_in = 5", "}"]
+        ),
+        "hyprlock.conf": block(
+            [
+                f"{name} = rgba(0, 0, 0, 1.0)"
+                for name in (
+                    "$color", "$inner_color", "$outer_color", "$font_color",
+                    "$placeholder_color", "$check_color",
+                )
+            ]
+        ),
+        "mako.ini": block(
+            ["text-color=#000000", "border-color=#000000", "background-color=#000000", "width=420"]
+        ),
+        "waybar.css": block(
+            ["@define-color background #000000;", "@define-color foreground #000000;"]
+        ),
+        "wofi.css": block(
+            [
+                f"@define-color {name} #000000;"
+                for name in ("bg", "fg", "gray1", "gray2", "gray3", "gray4", "gray5", "fg_bright")
+            ]
+        ),
+        "walker.css": block(
+            [
+                f"@define-color {name} #000000;"
+                for name in ("selected-text", "text", "base", "border", "foreground", "background")
+            ]
+        ),
+        "swayosd.css": block(
+            [
+                f"@define-color {name} #000000;"
+                for name in ("background-color", "border-color", "label", "image", "progress")
+            ]
+        ),
+        "btop.theme": block([f'theme[{key}]="#000000"' for key in BTOP_KEYS]),
+        "cava_theme": block(
+            ["[color]", "gradient = 1"] + [f"gradient_color_{i} = '#000000'" for i in range(1, 9)]
+        ),
+        "gtk.css": block(
+            [f"@define-color {name} #000000;" for name in GTK_NAMES]
+            + ["@define-color accent_bg_color @blue;", "window { background: @background; }"]
+        ),
+        "aether.override.css": block([f"@define-color {name} #000000;" for name in GTK_NAMES]),
+        "steam.css": block([":root {"] + [f"  {key}: 0, 0, 0;" for key in STEAM_KEYS] + ["}"]),
+    }
+    files = {name: contents * scale for name, contents in files.items()}
+    files["chromium.theme"] = "0,0,0\n"
+
+    zed = {
+        "$schema": "https://zed.dev/schema/themes/v0.2.0.json",
+        "name": "Aether",
+        "author": "theme-color-tool",
+        "themes": [zed_theme(index, scale) for index in range(1 + scale // 500)],
+    }
+    files["aether.zed.json"] = json.dumps(zed, indent=2) + "\n"
+    return files
+
+
+def write_scheme(path):
+    with open(path, "w", encoding="utf-8") as f:
+        f.write(SCHEME)
+
+
+def write_theme(root, scale=1, names=None):
+    os.makedirs(root, exist_ok=True)
+    for name, contents in theme_files(scale).items():
+        if names is not None and name not in names:
+            continue
+        with open(os.path.join(root, name), "w", encoding="utf-8") as f:
+            f.write(contents)
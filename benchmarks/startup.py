@@ -0,0 +1,101 @@
+"""Measure apply_theme start-up cost.
+
+Reports the module's import time (from ``python -X importtime``) and the
+median wall time of a full CLI run against a synthetic theme directory,
+next to a bare ``python -c pass`` baseline. Exits 1 when the CLI run costs
+more than --budget-ms on top of that baseline.
+
+    python benchmarks/startup.py [--runs N] [--budget-ms MS]
+"""
+
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+from fixtures import write_scheme, write_theme
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+MODULE = "theme_color_tool.apply_theme"
+
+
+def child_env():
+    env = dict(os.environ)
+    env["PYTHONPATH"] = os.pathsep.join(filter(None, [REPO_ROOT, env.get("PYTHONPATH")]))
+    # Byte-compiled caches are part of a normal install; don't time without them.
+    env.pop("PYTHONDONTWRITEBYTECODE", None)
+    return env
+
+
+def import_times(env):
+    proc = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {MODULE}"],
+        env=env,
+        stderr=subprocess.PIPE,
+        stdout=subprocess.DEVNULL,
+        text=True,
+        check=True,
+    )
+    rows = []
+    for line in proc.stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        self_us, cumulative_us, name = line[len("import time:"):].split("|")
+        rows.append((int(self_us), int(cumulative_us), name.rstrip()))
+    return rows
+
+
+def wall_ms(cmd, env, cwd, runs):
+    samples = []
+    for _ in range(runs):
+        start = time.perf_counter_ns()
+        subprocess.run(cmd, env=env, cwd=cwd, stdout=subprocess.DEVNULL, check=True)
+        samples.append((time.perf_counter_ns() - start) / 1e6)
+    return statistics.median(samples)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--runs", type=int, default=20, help="Runs per measurement.")
+    parser.add_argument(
+        "--budget-ms", type=float, default=30.0, help="Allowed CLI time over interpreter start."
+    )
+    parser.add_argument("--top", type=int, default=8, help="Slowest imports to list.")
+    args = parser.parse_args(argv)
+
+    env = child_env()
+    import_times(env)  # first run writes the byte-code caches
+    rows = import_times(env)
+    total = next((row for row in rows if row[2].strip() == MODULE), None)
+    print("Slowest imports (cumulative us):")
+    for self_us, cumulative_us, name in sorted(rows, key=lambda row: -row[1])[: args.top]:
+        print(f"  {cumulative_us:>8}  {self_us:>8}  {name.strip()}")
+    if total is not None:
+        print(f"{MODULE}: {total[1] / 1000:.1f} ms cumulative, {total[0] / 1000:.1f} ms self")
+
+    with tempfile.TemporaryDirectory() as tmp:
+        theme = os.path.join(tmp, "theme")
+        scheme = os.path.join(tmp, "scheme.yaml")
+        write_theme(theme)
+        write_scheme(scheme)
+        cache = {"XDG_CACHE_HOME": os.path.join(tmp, "cache")}
+        env.update(cache)
+        cli = [sys.executable, "-m", MODULE, "-q", "-s", scheme]
+        # Warm the byte-code and scheme caches before timing.
+        subprocess.run(cli, env=env, cwd=theme, stdout=subprocess.DEVNULL, check=True)
+        baseline = wall_ms([sys.executable, "-c", "pass"], env, theme, args.runs)
+        run = wall_ms(cli, env, theme, args.runs)
+
+    print(f"python -c pass: {baseline:.1f} ms")
+    print(f"apply_theme:    {run:.1f} ms (+{run - baseline:.1f} ms over interpreter start)")
+    if run - baseline > args.budget_ms:
+        print(f"over budget: {run - baseline:.1f} ms > {args.budget_ms:.1f} ms")
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,136 @@
+"""Throughput of every update_* formatter, plus end-to-end main() time.
+
+Each supported file is generated at two sizes: a realistic one (scale 1)
+and a stress one (--scale, default 2000). Every updater is run against
+both and reported in lines/sec and MB/sec; main() is then timed on a full
+theme directory of each size.
+
+    python benchmarks/updaters.py [--scale N] [--min-time S] [--json FILE]
+"""
+
+import argparse
+import json
+import os
+import sys
+import tempfile
+import time
+
+from fixtures import theme_files, write_scheme, write_theme
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from theme_color_tool import apply_theme  # noqa: E402
+
+
+def time_call(fn, min_time):
+    """Return the best per-call time in seconds over at least min_time."""
+    best = None
+    spent = 0
+    while spent < min_time or best is None:
+        start = time.perf_counter_ns()
+        fn()
+        elapsed = time.perf_counter_ns() - start
+        spent += elapsed / 1e9
+        best = elapsed if best is None else min(best, elapsed)
+    return best / 1e9
+
+
+def bench_updaters(palette, scale, min_time):
+    results = []
+    files = theme_files(scale)
+    for filename, update_fn in apply_theme.FORMATS:
+        contents = files[filename]
+        seconds = time_call(lambda: update_fn(contents, palette), min_time)
+        size = len(contents.encode("utf-8"))
+        lines = contents.count("\n") or 1
+        results.append(
+            {
+                "file": filename,
+                "scale": scale,
+                "bytes": size,
+                "lines": lines,
+                "seconds": seconds,
+                "lines_per_sec": lines / seconds,
+                "mb_per_sec": size / seconds / 1e6,
+            }
+        )
+    return results
+
+
+def bench_main(tmp, scheme, scale, min_time, jobs):
+    theme = os.path.join(tmp, f"theme-{scale}")
+    pristine = theme_files(scale)
+    argv = ["-q", "-s", scheme, "-j", str(jobs), theme]
+
+    def run():
+        # Reset the files so every run rewrites them rather than skipping.
+        write_theme(theme, scale)
+        start = time.perf_counter_ns()
+        apply_theme.main(argv)
+        return time.perf_counter_ns() - start
+
+    run()
+    samples = []
+    spent = 0
+    while spent < min_time or not samples:
+        elapsed = run()
+        samples.append(elapsed)
+        spent += elapsed / 1e9
+    return {
+        "scale": scale,
+        "jobs": jobs,
+        "bytes": sum(len(contents.encode("utf-8")) for contents in pristine.values()),
+        "seconds": min(samples) / 1e9,
+    }
+
+
+def print_table(results):
+    print(f"{'file':<22}{'scale':>7}{'KiB':>10}{'lines':>9}{'ms':>10}{'lines/s':>13}{'MB/s':>9}")
+    for row in results:
+        print(
+            f"{row['file']:<22}{row['scale']:>7}{row['bytes'] / 1024:>10.1f}{row['lines']:>9}"
+            f"{row['seconds'] * 1e3:>10.3f}{row['lines_per_sec']:>13,.0f}{row['mb_per_sec']:>9.1f}"
+        )
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--scale", type=int, default=2000, help="Stress fixture scale.")
+    parser.add_argument(
+        "--min-time", type=float, default=0.2, help="Seconds to spend per measurement."
+    )
+    parser.add_argument("-j", "--jobs", type=int, default=1, help="Workers for main() runs.")
+    parser.add_argument("--json", metavar="FILE", help="Also write the results to FILE.")
+    args = parser.parse_args(argv)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        scheme = os.path.join(tmp, "scheme.yaml")
+        write_scheme(scheme)
+        os.environ["XDG_CACHE_HOME"] = os.path.join(tmp, "cache")
+        palette = apply_theme.load_scheme(scheme)[1]
+
+        updaters = []
+        for scale in (1, args.scale):
+            updaters.extend(bench_updaters(palette, scale, args.min_time))
+        print_table(updaters)
+
+        runs = [
+            bench_main(tmp, scheme, scale, args.min_time, args.jobs) for scale in (1, args.scale)
+        ]
+
+    print()
+    for run in runs:
+        print(
+            f"main() scale {run['scale']}, -j {run['jobs']}: {run['seconds'] * 1e3:.2f} ms "
+            f"({run['bytes'] / run['seconds'] / 1e6:.1f} MB/s)"
+        )
+
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump({"updaters": updaters, "main": runs}, f, indent=2)
+            f.write("\n")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,189 @@
+"""Regression tests for the updaters and the Zed JSON scanner.
+
+tests/golden/updaters.json holds, for every supported file, the output and
+report of the original per-updater implementations (json.loads/json.dumps
+for aether.zed.json) on the benchmarks/fixtures.py theme at scale 1, and on
+a sparse copy of it with lines dropped so the missing-key reports are
+exercised too. The current updaters must reproduce both exactly.
+
+    python -m pytest tests
+"""
+
+import json
+import os
+import sys
+
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(ROOT, "benchmarks"))
+sys.path.insert(0, ROOT)
+
+from fixtures import theme_files, write_scheme  # noqa: E402
+
+from theme_color_tool.apply_theme import (  # noqa: E402
+    FORMATS,
+    ZED_SHAPE,
+    Palette,
+    scan_json,
+    update_aether_zed,
+)
+
+GOLDEN = os.path.join(os.path.dirname(os.path.abspath(__file__)), "golden", "updaters.json")
+
+LIGHT = {f"base0{i:X}": f"#{i:x}{i:x}{i:x}{i:x}{i:x}{i:x}" for i in range(16)}
+
+
+def sparse_variant(name, text):
+    """Drop every third line (for aether.zed.json: every third style and
+    syntax member), so that updaters report missing keys."""
+    if name == "aether.zed.json":
+        data = json.loads(text)
+        style = data["themes"][0]["style"]
+        for key in [key for key in style if key not in ("players", "syntax")][::3]:
+            del style[key]
+        for key in list(style["syntax"])[::3]:
+            del style["syntax"][key]
+        return json.dumps(data, indent=2) + "\n"
+    return "".join(line for index, line in enumerate(text.splitlines(True)) if index % 3 != 1)
+
+
+def variant_inputs():
+    files = theme_files(1)
+    return {
+        "full": files,
+        "sparse": {name: sparse_variant(name, text) for name, text in files.items()},
+    }
+
+
+@pytest.fixture(scope="module")
+def palette(tmp_path_factory):
+    path = str(tmp_path_factory.mktemp("scheme") / "scheme.yaml")
+    write_scheme(path)
+    return Palette.from_scheme(path, cache=False)
+
+
+@pytest.fixture(scope="module")
+def golden():
+    with open(GOLDEN, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+@pytest.mark.parametrize("variant", ["full", "sparse"])
+@pytest.mark.parametrize("name,update_fn", FORMATS, ids=[name for name, _ in FORMATS])
+def test_updater_matches_baseline(name, update_fn, variant, palette, golden):
+    text = variant_inputs()[variant][name]
+    expected_output, expected_report = golden[variant][name]
+
+    output, report = update_fn(text, palette)
+
+    assert output == expected_output
+    assert list(report) == expected_report
+
+
+def test_missing_entries_carry_key_names(palette):
+    text = sparse_variant("kitty.conf", theme_files(1)["kitty.conf"])
+    _, report = dict(FORMATS)["kitty.conf"](text, palette)
+    missing = [entry for entry in report if entry.startswith("missing ")]
+    assert [entry.keys for entry in missing] == [
+        ["foreground", "color1", "color4", "color7", "color10", "color13"]
+    ]
+
+
+@pytest.mark.parametrize(
+    "text",
+    [
+        "",
+        "[1",
+        "{} x",
+        '{"a" 1}',
+        '{"a": 1,}',
+        '{a: 1}',
+        '{"a": [1 2]}',
+        '{"a": "unterminated}',
+        '{"a": "bad \\q escape"}',
+        '{"bad \\q key": 1}',
+        '{"a": "tab\there"}',
+        '{"themes": [{"style": {"syntax": {"string": {"color": "#000000" }}}]}',
+        '{"themes": [{"style": {"players": [{"cursor": "#000000"},]}}]}',
+    ],
+)
+def test_scan_json_rejects_malformed_input(text):
+    with pytest.raises(json.JSONDecodeError):
+        json.loads(text)
+    with pytest.raises(json.JSONDecodeError):
+        scan_json(text, ZED_SHAPE)
+
+
+def test_scan_json_spans_and_escaped_keys():
+    text = '{"a": "x", "b\\u0020c": [1, {"d": "y"}], "e\\"": {"f": null}}'
+    node = scan_json(text, {"b c": [{}], 'e"': {}})
+
+    assert sorted(node) == ["a", "b c", 'e"']
+    assert text[slice(*node["a"])] == '"x"'
+    assert text[slice(*node["b c"][0])] == "1"
+    assert text[slice(*node["b c"][1]["d"])] == '"y"'
+    assert text[slice(*node['e"']["f"])] == "null"
+
+
+def test_zed_escaped_keys_are_updated(palette):
+    text = '{"themes": [{"style": {"t\\u0065xt": "#000000", "syntax": {}}}]}\n'
+    output, report = update_aether_zed(text, palette)
+
+    assert json.loads(output)["themes"][0]["style"]["text"] == palette["base16"]["base05"]
+    assert f"style.text -> {palette['base16']['base05']}" in report
+    # Only the value is spliced; the escaped key is left as written.
+    assert '"t\\u0065xt"' in output
+
+
+def test_zed_non_object_entries(palette):
+    text = json.dumps(
+        {
+            "themes": [
+                1,
+                "theme",
+                {"style": {"text": "#000000", "players": [None, 2, {"cursor": "#000000"}]}},
+            ]
+        }
+    )
+    output, report = update_aether_zed(text, palette)
+
+    themes = json.loads(output)["themes"]
+    assert themes[:2] == [1, "theme"]
+    assert themes[2]["style"]["text"] == palette["base16"]["base05"]
+    assert themes[2]["style"]["players"][:2] == [None, 2]
+    assert themes[2]["style"]["players"][2]["cursor"] == palette["base16"]["base05"]
+    assert "missing themes[0].style.text" in report
+    assert "missing themes[2].players[0].cursor" in report
+    assert "missing themes[2].players[1].selection" in report
+
+
+@pytest.mark.parametrize("themes", [{}, "themes", None])
+def test_zed_non_list_themes_is_left_alone(themes, palette):
+    text = json.dumps({"themes": themes})
+    output, report = update_aether_zed(text, palette)
+
+    assert output == text
+    assert report and all(entry.startswith("missing ") for entry in report)
+
+
+def test_zed_multi_theme_pack(palette):
+    light = Palette.from_base16(LIGHT)
+    pack = json.loads(theme_files(1)["aether.zed.json"])
+    theme = pack["themes"][0]
+    pack["themes"] = [theme, dict(theme, name="Aether Light", appearance="light")]
+    text = json.dumps(pack, indent=2) + "\n"
+
+    output, report = update_aether_zed(text, palette, {"light": light})
+
+    dark_style, light_style = (entry["style"] for entry in json.loads(output)["themes"])
+    assert dark_style["text"] == palette["base16"]["base05"]
+    assert light_style["text"] == light["base16"]["base05"]
+    assert light_style["syntax"]["string"]["color"] == light["base16"]["base0B"]
+    assert f"themes[0].style.text -> {palette['base16']['base05']}" in report
+    assert f"themes[1].style.text -> {light['base16']['base05']}" in report
+
+    # Without appearances, every entry gets the main palette.
+    output, _ = update_aether_zed(text, palette)
+    styles = [entry["style"] for entry in json.loads(output)["themes"]]
+    assert styles[0] == styles[1]
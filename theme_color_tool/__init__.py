@@ -1 +1,26 @@
-__all__ = ["apply_theme"]
+# The public names live in apply_theme and are imported on first access
+# (PEP 562), so `python -m theme_color_tool.apply_theme` does not import the
+# module once here and again as __main__.
+__all__ = [
+    "apply_theme",
+    "FileReport",
+    "Palette",
+    "Transform",
+    "apply_directories",
+    "apply_directory",
+    "apply_to_directory",
+    "transform",
+]
+
+
+def __getattr__(name):
+    if name in __all__:
+        from importlib import import_module
+
+        apply_theme = import_module(".apply_theme", __name__)
+        return apply_theme if name == "apply_theme" else getattr(apply_theme, name)
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+
+def __dir__():
+    return sorted(list(globals()) + __all__)
@@ -1,9 +1,22 @@
 #!/usr/bin/env python3
 import argparse
-import json
+import io
+import marshal
 import os
 import re
+import stat
 import sys
+import threading
+import time
+import zlib
+from collections import namedtuple
+from contextlib import contextmanager, nullcontext
+from functools import partial
+from types import FunctionType
+
+# json, hashlib, glob and concurrent.futures are imported where they are used:
+# the common run (one scheme, cached, in the current directory) never needs
+# them, and together they dominate interpreter startup.
 
 BASE16_KEYS = [f"base{n:02X}" for n in range(16)]
 
@@ -26,6 +39,13 @@ ANSI_MAP = {
     15: "base07",
 }
 
+UI_KEYS = {
+    "background": "base00",
+    "foreground": "base05",
+    "accent": "base0D",
+    "cursor": "base05",
+}
+
 NEOVIM_KEYS = {
     "bg": "base00",
     "bg_dark": "base00",
@@ -43,8 +63,91 @@ NEOVIM_KEYS = {
     "magenta": "base0F",
 }
 
+class LazyPattern(object):
+    # Compiles on first use, then caches the compiled pattern's methods on the
+    # instance so later calls cost a plain attribute lookup.
+    def __init__(self, source, flags=0):
+        self.pattern = source
+        self.flags = flags
+
+    def __getattr__(self, name):
+        if name.startswith("__"):
+            raise AttributeError(name)
+        compiled = re.compile(self.pattern, self.flags)
+        for attr in ("match", "search", "finditer", "findall", "sub", "subn"):
+            setattr(self, attr, getattr(compiled, attr))
+        return getattr(compiled, name)
+
+
+def lazy_re(source, flags=0):
+    return LazyPattern(source, flags)
+
+
 ANSI_RESET = "\x1b[0m"
-TEMPLATE_TOKEN_RE = re.compile(r"{{\s*([a-zA-Z0-9_]+)\s*}}")
+TEMPLATE_TOKEN_RE = lazy_re(r"{{\s*([a-zA-Z0-9_]+)\s*}}")
+REPORT_HEX_RE = lazy_re(r"(#[0-9A-Fa-f]{6})")
+JSON_WS_RE = lazy_re(r"[ \t\n\r]*")
+SCHEME_LINE_RE = lazy_re(r"^\s*(base[0-9A-Fa-f]{2})\s*:\s*['\"]?(#[0-9A-Fa-f]{6})")
+# Line boundaries str.splitlines() honours besides \n and \r, which iterating
+# a file does not; and the same characters, plus \r, as UTF-8 bytes.
+LINE_BREAK_RE = lazy_re(r"[\x0b\x0c\x1c-\x1e\x85\u2028\u2029]")
+LINE_BREAK_BYTES_RE = lazy_re(rb"[\r\x0b\x0c\x1c-\x1e]|\xc2\x85|\xe2\x80[\xa8\xa9]")
+
+HEX = r"#?[0-9A-Fa-f]{6}"
+
+PLAN_CACHE = threading.local()
+TIMINGS = threading.local()
+
+ANSI_SLOTS = {i: ("ansi", i) for i in range(16)}
+
+# Files at least this large are rewritten in worker processes under --jobs, so
+# the regex passes are not serialized on the GIL.
+PROCESS_POOL_MIN_BYTES = 256 * 1024
+
+MANIFEST_VERSION = 1
+
+# Files at least this large are rewritten line by line by updaters that
+# support it, instead of being read into memory whole.
+STREAM_MIN_BYTES = 16 * 1024 * 1024
+
+# Files at least this large are mmap()ed and spliced as bytes by updaters in
+# BUFFER_UPDATERS.
+MMAP_MIN_BYTES = 1024 * 1024
+
+# Default number of files apply_directories keeps in flight; reads and writes
+# on network storage are latency- rather than CPU-bound.
+ASYNC_CONCURRENCY = 64
+
+# --watch: how often the polling fallback checks mtimes, and how long a burst
+# of inotify events may take to settle before re-applying.
+WATCH_POLL_INTERVAL = 0.5
+WATCH_DEBOUNCE = 0.05
+
+# --daemon: requests for a directory that arrive within this window of each
+# other (or while it is being applied) are merged into one apply.
+DAEMON_COALESCE = 0.01
+
+SCHEME_CACHE_VERSION = 2
+SCHEME_CACHE_MAX_BYTES = 1024 * 1024
+
+TEMPLATE_CACHE_VERSION = 1
+TEMPLATE_CACHE_MAX_BYTES = 1024 * 1024
+
+# Compiled templates by absolute path, as (cache key, Template). Shared by all
+# threads; a racing compile just stores the same template twice.
+TEMPLATE_CACHE = {}
+
+ANSI_COLOR_NAMES = ["black", "red", "green", "yellow", "blue", "magenta", "cyan", "white"]
+
+# A line rule rewrites the `value` group of lines matched by `pattern`. The
+# `key` group (optionally passed through `normalize`) selects a palette slot,
+# given as a (palette group, name) pair, e.g. ("ui", "background"). With an
+# `encoding`, the value is written (or passed to `render`) in that Palette
+# encoding; reports always show the "#rrggbb" colour.
+LineRule = namedtuple(
+    "LineRule",
+    ["pattern", "slots", "label", "report", "render", "normalize", "encoding"],
+)
 
 
 def hex_to_rgb(hex_color):
@@ -66,7 +169,7 @@ def swatch(hex_color, label):
 
 
 def format_report_line(entry):
-    match = re.search(r"(#[0-9A-Fa-f]{6})", entry)
+    match = REPORT_HEX_RE.search(entry)
     if not match:
         return entry
     hex_color = match.group(1)
@@ -74,12 +177,11 @@ def format_report_line(entry):
 
 def load_base16(path):
     base16 = {}
-    line_re = re.compile(r"^\s*(base[0-9A-Fa-f]{2})\s*:\s*['\"]?(#[0-9A-Fa-f]{6})")
     if not os.path.exists(path):
         raise FileNotFoundError(f"Scheme file not found: {path}")
     with open(path, "r", encoding="utf-8") as f:
         for line in f:
-            match = line_re.match(line)
+            match = SCHEME_LINE_RE.match(line)
             if not match:
                 continue
             raw_hex = match.group(1)[4:]
@@ -95,1027 +197,1221 @@ def load_base16(path):
 
 
 def build_palette(base16):
-    ansi = {i: base16[ANSI_MAP[i]] for i in range(16)}
-    base16_indexed = {i: base16[f"base{i:02X}"] for i in range(16)}
-    ui = {
-        "background": base16["base00"],
-        "foreground": base16["base05"],
-        "accent": base16["base0D"],
-        "cursor": base16["base05"],
-    }
-    neovim = {key: base16[val] for key, val in NEOVIM_KEYS.items()}
-    return {
-        "ansi": ansi,
-        "base16_indexed": base16_indexed,
-        "ui": ui,
-        "neovim": neovim,
-        "base16": base16,
-    }
+    return Palette(base16[key] for key in BASE16_KEYS)
 
 
-def build_gtk_ui_colors(base16):
-    return {
-        "background": base16["base00"],
-        "foreground": base16["base05"],
-        "black": base16["base00"],
-        "red": base16["base08"],
-        "green": base16["base0B"],
-        "yellow": base16["base0A"],
-        "blue": base16["base0D"],
-        "magenta": base16["base0E"],
-        "cyan": base16["base0C"],
-        "white": base16["base05"],
-        "bright_black": base16["base01"],
-        "bright_red": base16["base09"],
-        "bright_green": base16["base0B"],
-        "bright_yellow": base16["base0A"],
-        "bright_blue": base16["base0D"],
-        "bright_magenta": base16["base0F"],
-        "bright_cyan": base16["base0C"],
-        "bright_white": base16["base07"],
-        "selection_bg": base16["base0A"],
-        "selection_fg": base16["base00"],
-    }
+# Palette groups the updaters' slots name: group -> slot name -> the index
+# (0-15) of the base16 colour it takes.
+PALETTE_GROUPS = {
+    "base16": {key: index for index, key in enumerate(BASE16_KEYS)},
+    "base16_indexed": {index: index for index in range(16)},
+    "ansi": {index: BASE16_KEYS.index(key) for index, key in ANSI_MAP.items()},
+    "ui": {key: BASE16_KEYS.index(val) for key, val in UI_KEYS.items()},
+    "neovim": {key: BASE16_KEYS.index(val) for key, val in NEOVIM_KEYS.items()},
+}
 
+# Encodings of a colour, given as its packed 0xRRGGBB int and its "#rrggbb"
+# spelling (the "hex" encoding, kept as the scheme wrote it).
+ENCODINGS = {
+    "bare": lambda rgb, color: color[1:],
+    "rgb": lambda rgb, color: f"{rgb >> 16}, {rgb >> 8 & 0xFF}, {rgb & 0xFF}",
+}
 
-def render_template(template_text, context):
-    missing = set()
 
-    def repl(match):
-        key = match.group(1)
-        if key in context:
-            return context[key]
-        missing.add(key)
-        return match.group(0)
+class Palette(object):
+    """A Base16 palette: base00-base0F, stored once as packed 0xRRGGBB ints.
+
+    palette[group][name] is the "#rrggbb" colour of an updater slot (see
+    PALETTE_GROUPS), palette.encoded(form) all 16 colours in one of the
+    ENCODINGS and palette.derived(key, build) any other per-palette table.
+    All are built on first use and kept. Pickling sends only the colours, so
+    palettes are cheap to hand to worker processes.
+    """
+
+    __slots__ = ("rgb", "_groups", "_encodings", "_derived")
+
+    def __init__(self, colors):
+        colors = tuple(colors)
+        self.rgb = tuple(int(color[1:], 16) for color in colors)
+        self._groups = {}
+        self._encodings = {"hex": colors}
+        self._derived = {}
+
+    def __reduce__(self):
+        return self.__class__, (self._encodings["hex"],)
+
+    def __getitem__(self, group):
+        try:
+            return self._groups[group]
+        except KeyError:
+            hexes = self._encodings["hex"]
+            colors = {name: hexes[index] for name, index in PALETTE_GROUPS[group].items()}
+            self._groups[group] = colors
+            return colors
+
+    def __eq__(self, other):
+        if not isinstance(other, Palette):
+            return NotImplemented
+        return self._encodings["hex"] == other._encodings["hex"]
+
+    def __hash__(self):
+        return hash(self._encodings["hex"])
+
+    def __repr__(self):
+        return f"{self.__class__.__name__}({list(self._encodings['hex'])!r})"
+
+    def encoded(self, form):
+        values = self._encodings.get(form)
+        if values is None:
+            encode = ENCODINGS[form]
+            colors = zip(self.rgb, self._encodings["hex"])
+            values = self._encodings[form] = tuple(encode(*color) for color in colors)
+        return values
+
+    def encode(self, slot, form):
+        """Return the colour of slot, a (group, name) pair, in encoding form."""
+        return self.encoded(form)[PALETTE_GROUPS[slot[0]][slot[1]]]
+
+    def derived(self, key, build):
+        """Return build(palette), built once per palette and kept under key."""
+        try:
+            return self._derived[key]
+        except KeyError:
+            value = self._derived[key] = build(self)
+            return value
+
+    @classmethod
+    def from_scheme(cls, path, cache=True):
+        """Load a Base16 YAML scheme, through the on-disk scheme cache by default."""
+        return load_scheme(path, scheme_cache_dir() if cache else None)[1]
+
+    @classmethod
+    def from_base16(cls, colors):
+        """Build a palette from a mapping of base00-base0F to "#rrggbb" colours."""
+        missing = [key for key in BASE16_KEYS if key not in colors]
+        if missing:
+            raise ValueError(f"Missing Base16 keys: {', '.join(missing)}")
+        invalid = [
+            key
+            for key in BASE16_KEYS
+            if not str(colors[key]).startswith("#") or hex_to_rgb(colors[key]) is None
+        ]
+        if invalid:
+            raise ValueError(f"Invalid colours for: {', '.join(invalid)}")
+        return cls(colors[key] for key in BASE16_KEYS)
+
+
+GTK_UI_SLOTS = {
+    "background": ("base16", "base00"),
+    "foreground": ("base16", "base05"),
+    "black": ("base16", "base00"),
+    "red": ("base16", "base08"),
+    "green": ("base16", "base0B"),
+    "yellow": ("base16", "base0A"),
+    "blue": ("base16", "base0D"),
+    "magenta": ("base16", "base0E"),
+    "cyan": ("base16", "base0C"),
+    "white": ("base16", "base05"),
+    "bright_black": ("base16", "base01"),
+    "bright_red": ("base16", "base09"),
+    "bright_green": ("base16", "base0B"),
+    "bright_yellow": ("base16", "base0A"),
+    "bright_blue": ("base16", "base0D"),
+    "bright_magenta": ("base16", "base0F"),
+    "bright_cyan": ("base16", "base0C"),
+    "bright_white": ("base16", "base07"),
+    "selection_bg": ("base16", "base0A"),
+    "selection_fg": ("base16", "base00"),
+}
 
-    return TEMPLATE_TOKEN_RE.sub(repl, template_text), missing
 
+def scheme_cache_dir():
+    base = os.environ.get("XDG_CACHE_HOME") or os.path.join(os.path.expanduser("~"), ".cache")
+    return os.path.join(base, "theme-color-tool", "schemes")
 
-def update_ghostty(contents, palette):
-    ansi = palette["ansi"]
-    ui = palette["ui"]
-    replaced = {"background": False, "foreground": False, "palette": set()}
-    report = []
-    lines = contents.splitlines(keepends=True)
-    new_lines = []
 
-    for line in lines:
-        if re.match(r"^\s*background\s*=", line):
-            new_line, count = re.subn(
-                r"^(\s*background\s*=\s*)#?[0-9A-Fa-f]{6}",
-                lambda m: f"{m.group(1)}{ui['background']}",
-                line,
-            )
-            if count:
-                replaced["background"] = True
-                report.append(f"background -> {ui['background']}")
-            new_lines.append(new_line)
-            continue
-        if re.match(r"^\s*foreground\s*=", line):
-            new_line, count = re.subn(
-                r"^(\s*foreground\s*=\s*)#?[0-9A-Fa-f]{6}",
-                lambda m: f"{m.group(1)}{ui['foreground']}",
-                line,
-            )
-            if count:
-                replaced["foreground"] = True
-                report.append(f"foreground -> {ui['foreground']}")
-            new_lines.append(new_line)
-            continue
+# Parsed schemes are cached as marshal blobs keyed on (path, size, mtime_ns).
+# The cache is best effort: any problem reading or writing it falls back to
+# parsing the scheme directly.
+def load_scheme(path, cache_dir=None):
+    if cache_dir is None:
+        return parse_scheme(path)
 
-        pal_match = re.match(r"^(\s*palette\s*=\s*)(\d+)=#?[0-9A-Fa-f]{6}", line)
-        if pal_match:
-            index = int(pal_match.group(2))
-            if index in ansi:
-                new_line = re.sub(
-                    r"^(\s*palette\s*=\s*)\d+=#?[0-9A-Fa-f]{6}",
-                    lambda m: f"{m.group(1)}{index}={ansi[index]}",
-                    line,
-                )
-                replaced["palette"].add(index)
-                report.append(f"palette[{index}] -> {ansi[index]}")
-                new_lines.append(new_line)
-                continue
+    try:
+        info = os.stat(path)
+    except FileNotFoundError:
+        raise FileNotFoundError(f"Scheme file not found: {path}") from None
+    abs_path = os.path.abspath(path)
+    key = (SCHEME_CACHE_VERSION, abs_path, info.st_size, info.st_mtime_ns)
+    entry_name = f"{scheme_name(path)}-{zlib.crc32(abs_path.encode('utf-8')):08x}.bin"
+    entry_path = os.path.join(cache_dir, entry_name)
+
+    with timed("scheme cache"):
+        cached = read_scheme_cache(entry_path, key)
+    if cached is not None:
+        return cached
+
+    base16, palette = parse_scheme(path)
+    with timed("scheme cache"):
+        store_scheme_cache(cache_dir, entry_path, key, base16)
+    return base16, palette
+
+
+def parse_scheme(path):
+    with timed("scheme parse"):
+        base16 = load_base16(path)
+    with timed("palette"):
+        palette = build_palette(base16)
+    return base16, palette
+
+
+def read_scheme_cache(entry_path, key):
+    try:
+        with open(entry_path, "rb") as f:
+            entry_key, base16 = marshal.load(f)
+        if entry_key != key:
+            return None
+        os.utime(entry_path)
+    except (OSError, EOFError, ValueError, TypeError):
+        return None
+    return base16, build_palette(base16)
 
-        new_lines.append(line)
 
-    missing = []
-    if not replaced["background"]:
-        missing.append("background")
-    if not replaced["foreground"]:
-        missing.append("foreground")
-    missing_palette = [i for i in range(16) if i not in replaced["palette"]]
-    if missing:
-        report.append("missing keys: " + ", ".join(missing))
-    if missing_palette:
-        report.append("missing palette indexes: " + ", ".join(str(i) for i in missing_palette))
+def store_scheme_cache(cache_dir, entry_path, key, base16):
+    try:
+        os.makedirs(cache_dir, exist_ok=True)
+        write_file(entry_path, marshal.dumps((key, base16)))
+        evict_cache(cache_dir, SCHEME_CACHE_MAX_BYTES)
+    except OSError:
+        pass
+
+
+def evict_cache(cache_dir, max_bytes):
+    entries = []
+    with os.scandir(cache_dir) as it:
+        for entry in it:
+            if entry.name.endswith(".bin"):
+                info = entry.stat()
+                entries.append((info.st_mtime_ns, info.st_size, entry.path))
+    total = sum(size for _, size, _ in entries)
+    for _, size, path in sorted(entries):
+        if total <= max_bytes:
+            break
+        os.unlink(path)
+        total -= size
 
-    return "".join(new_lines), report
 
+def build_gtk_ui_colors(base16):
+    return {name: base16[slot[1]] for name, slot in GTK_UI_SLOTS.items()}
 
-def update_neovim(contents, palette):
-    neovim = palette["neovim"]
-    updated = contents
-    report = []
-    replaced_keys = set()
-
-    for key, value in neovim.items():
-        pattern = rf"(\b{re.escape(key)}\s*=\s*)(['\"]?)(#[0-9A-Fa-f]{{6}})(['\"]?)"
-        updated, count = re.subn(
-            pattern,
-            lambda m, v=value: f"{m.group(1)}{m.group(2)}{v}{m.group(4)}",
-            updated,
-        )
-        if count:
-            replaced_keys.add(key)
-            report.append(f"{key} -> {value}")
 
-    return updated, report
+# A compiled template: the literal text around its tokens (one more part than
+# there are slots), each slot as (name, token text), and the set of names.
+Template = namedtuple("Template", ["parts", "slots", "keys"])
 
 
-def update_alacritty(contents, palette):
-    ansi = palette["ansi"]
-    ui = palette["ui"]
-    section = None
-    replaced = {
-        "primary": {"background": False, "foreground": False},
-        "cursor": {"text": False, "cursor": False},
-        "normal": set(),
-        "bright": set(),
-    }
-    report = []
-    lines = contents.splitlines(keepends=True)
-    new_lines = []
+def compile_template(template_text):
+    parts = []
+    slots = []
+    position = 0
+    for match in TEMPLATE_TOKEN_RE.finditer(template_text):
+        parts.append(template_text[position:match.start()])
+        slots.append((match.group(1), match.group(0)))
+        position = match.end()
+    parts.append(template_text[position:])
+    return Template(tuple(parts), tuple(slots), frozenset(name for name, _ in slots))
 
-    for line in lines:
-        header_match = re.match(r"^\s*\[(.+)\]\s*$", line)
-        if header_match:
-            section = header_match.group(1).strip()
-            new_lines.append(line)
-            continue
 
-        if section == "colors.primary":
-            if re.match(r"^\s*background\s*=", line):
-                new_line, count = re.subn(
-                    r"^(\s*background\s*=\s*)(['\"]?)#?[0-9A-Fa-f]{6}\2",
-                    lambda m: f"{m.group(1)}{m.group(2)}{ui['background']}{m.group(2)}",
-                    line,
-                )
-                if count:
-                    replaced["primary"]["background"] = True
-                    report.append(f"colors.primary.background -> {ui['background']}")
-                new_lines.append(new_line)
-                continue
-            if re.match(r"^\s*foreground\s*=", line):
-                new_line, count = re.subn(
-                    r"^(\s*foreground\s*=\s*)(['\"]?)#?[0-9A-Fa-f]{6}\2",
-                    lambda m: f"{m.group(1)}{m.group(2)}{ui['foreground']}{m.group(2)}",
-                    line,
-                )
-                if count:
-                    replaced["primary"]["foreground"] = True
-                    report.append(f"colors.primary.foreground -> {ui['foreground']}")
-                new_lines.append(new_line)
-                continue
+def fill_template(template, context):
+    # Slots missing from context keep their token and are returned by name.
+    missing = template.keys.difference(context)
+    if missing:
+        values = [context.get(name, token) for name, token in template.slots]
+    else:
+        values = [context[name] for name, _ in template.slots]
+    pieces = [None] * (2 * len(values) + 1)
+    pieces[::2] = template.parts
+    pieces[1::2] = values
+    return "".join(pieces), set(missing)
 
-        if section == "colors.cursor":
-            if re.match(r"^\s*text\s*=", line):
-                new_line, count = re.subn(
-                    r"^(\s*text\s*=\s*)(['\"]?)#?[0-9A-Fa-f]{6}\2",
-                    lambda m: f"{m.group(1)}{m.group(2)}{ui['background']}{m.group(2)}",
-                    line,
-                )
-                if count:
-                    replaced["cursor"]["text"] = True
-                    report.append(f"colors.cursor.text -> {ui['background']}")
-                new_lines.append(new_line)
-                continue
-            if re.match(r"^\s*cursor\s*=", line):
-                new_line, count = re.subn(
-                    r"^(\s*cursor\s*=\s*)(['\"]?)#?[0-9A-Fa-f]{6}\2",
-                    lambda m: f"{m.group(1)}{m.group(2)}{ui['cursor']}{m.group(2)}",
-                    line,
-                )
-                if count:
-                    replaced["cursor"]["cursor"] = True
-                    report.append(f"colors.cursor.cursor -> {ui['cursor']}")
-                new_lines.append(new_line)
-                continue
 
-        if section == "colors.normal" or section == "colors.bright":
-            target = "normal" if section == "colors.normal" else "bright"
-            color_map = {
-                "black": 0,
-                "red": 1,
-                "green": 2,
-                "yellow": 3,
-                "blue": 4,
-                "magenta": 5,
-                "cyan": 6,
-                "white": 7,
-            }
-            for name, base_index in color_map.items():
-                if re.match(rf"^\s*{name}\s*=", line):
-                    index = base_index if target == "normal" else base_index + 8
-                    new_line, count = re.subn(
-                        rf"^(\s*{name}\s*=\s*)(['\"]?)#?[0-9A-Fa-f]{{6}}\2",
-                        lambda m: f"{m.group(1)}{m.group(2)}{ansi[index]}{m.group(2)}",
-                        line,
-                    )
-                    if count:
-                        replaced[target].add(name)
-                        report.append(f"colors.{target}.{name} -> {ansi[index]}")
-                    new_lines.append(new_line)
-                    break
-            else:
-                new_lines.append(line)
-            continue
+def render_template(template_text, context):
+    return fill_template(compile_template(template_text), context)
 
-        new_lines.append(line)
 
-    missing = []
-    if not replaced["primary"]["background"] or not replaced["primary"]["foreground"]:
-        missing.append("colors.primary")
-    if not replaced["cursor"]["text"] or not replaced["cursor"]["cursor"]:
-        missing.append("colors.cursor")
-    for section_name in ("normal", "bright"):
-        if len(replaced[section_name]) != 8:
-            missing.append(f"colors.{section_name}")
-    if missing:
-        report.append("missing sections/keys: " + ", ".join(missing))
+def template_cache_dir():
+    return os.path.join(os.path.dirname(scheme_cache_dir()), "templates")
 
-    return "".join(new_lines), report
 
+# Compiled templates are kept in TEMPLATE_CACHE and, given a cache_dir, as
+# marshal blobs on disk, both keyed on (path, size, mtime_ns) like schemes.
+def load_template(path, cache_dir=None):
+    """Return the compiled template at path, or None if there is no such file."""
+    abs_path = os.path.abspath(path)
+    try:
+        info = os.stat(abs_path)
+    except FileNotFoundError:
+        return None
+    key = (TEMPLATE_CACHE_VERSION, abs_path, info.st_size, info.st_mtime_ns)
+    cached = TEMPLATE_CACHE.get(abs_path)
+    if cached is not None and cached[0] == key:
+        return cached[1]
+
+    template = None
+    if cache_dir is not None:
+        entry_name = f"{os.path.basename(path)}-{zlib.crc32(abs_path.encode('utf-8')):08x}.bin"
+        entry_path = os.path.join(cache_dir, entry_name)
+        template = read_template_cache(entry_path, key)
+    if template is None:
+        with open(abs_path, "r", encoding="utf-8") as f:
+            template = compile_template(f.read())
+        if cache_dir is not None:
+            store_template_cache(cache_dir, entry_path, key, template)
+    TEMPLATE_CACHE[abs_path] = (key, template)
+    return template
+
+
+def read_template_cache(entry_path, key):
+    try:
+        with open(entry_path, "rb") as f:
+            entry_key, template = marshal.load(f)
+        if entry_key != key:
+            return None
+        os.utime(entry_path)
+    except (OSError, EOFError, ValueError, TypeError):
+        return None
+    return Template(*template)
 
-def update_kitty(contents, palette):
-    ansi = palette["ansi"]
-    ui = palette["ui"]
-    replaced = {"background": False, "foreground": False, "colors": set()}
-    report = []
-    lines = contents.splitlines(keepends=True)
-    new_lines = []
 
-    for line in lines:
-        if re.match(r"^\s*background\s+", line):
-            new_line, count = re.subn(
-                r"^(\s*background\s+)#?[0-9A-Fa-f]{6}(.*)$",
-                lambda m: f"{m.group(1)}{ui['background']}{m.group(2)}",
-                line,
-            )
-            if count:
-                replaced["background"] = True
-                report.append(f"background -> {ui['background']}")
-            new_lines.append(new_line)
-            continue
-        if re.match(r"^\s*foreground\s+", line):
-            new_line, count = re.subn(
-                r"^(\s*foreground\s+)#?[0-9A-Fa-f]{6}(.*)$",
-                lambda m: f"{m.group(1)}{ui['foreground']}{m.group(2)}",
-                line,
-            )
-            if count:
-                replaced["foreground"] = True
-                report.append(f"foreground -> {ui['foreground']}")
-            new_lines.append(new_line)
-            continue
+def store_template_cache(cache_dir, entry_path, key, template):
+    try:
+        os.makedirs(cache_dir, exist_ok=True)
+        write_file(entry_path, marshal.dumps((key, tuple(template))))
+        evict_cache(cache_dir, TEMPLATE_CACHE_MAX_BYTES)
+    except OSError:
+        pass
 
-        color_match = re.match(r"^\s*color(\d{1,2})\s+#?[0-9A-Fa-f]{6}", line)
-        if color_match:
-            index = int(color_match.group(1))
-            if index in ansi:
-                new_line = re.sub(
-                    r"^(\s*color\d{1,2}\s+)#?[0-9A-Fa-f]{6}(.*)$",
-                    lambda m: f"{m.group(1)}{ansi[index]}{m.group(2)}",
-                    line,
-                )
-                replaced["colors"].add(index)
-                report.append(f"color{index} -> {ansi[index]}")
-                new_lines.append(new_line)
-                continue
 
-        new_lines.append(line)
+def line_rule(
+    pattern,
+    slots,
+    label="{key}",
+    report="{label} -> {value}",
+    render=None,
+    normalize=None,
+    encoding=None,
+):
+    if isinstance(pattern, str):
+        pattern = lazy_re(pattern)
+    return LineRule(pattern, slots, label, report, render, normalize, encoding)
 
-    missing = []
-    if not replaced["background"] or not replaced["foreground"]:
-        missing.append("background/foreground")
-    missing_colors = [i for i in range(16) if i not in replaced["colors"]]
-    if missing_colors:
-        missing.append("colors: " + ", ".join(str(i) for i in missing_colors))
-    if missing:
-        report.append("missing keys: " + ", ".join(missing))
 
-    return "".join(new_lines), report
+def key_alternation(keys):
+    return "|".join(re.escape(key) for key in sorted(keys, key=len, reverse=True))
 
 
-def update_warp(contents, palette):
-    ansi = palette["ansi"]
-    ui = palette["ui"]
-    section = None
-    in_terminal_colors = False
-    replaced = {
-        "background": False,
-        "foreground": False,
-        "accent": False,
-        "cursor": False,
-        "normal": set(),
-        "bright": set(),
-    }
-    report = []
-    lines = contents.splitlines(keepends=True)
-    new_lines = []
+def quote_value(key, value, match):
+    return f"'{value}'"
 
-    for line in lines:
-        if re.match(r"^\s*terminal_colors:\s*$", line):
-            in_terminal_colors = True
-            section = None
-            new_lines.append(line)
-            continue
-        if in_terminal_colors and re.match(r"^\s*normal:\s*$", line):
-            section = "normal"
-            new_lines.append(line)
-            continue
-        if in_terminal_colors and re.match(r"^\s*bright:\s*$", line):
-            section = "bright"
-            new_lines.append(line)
-            continue
-        if re.match(r"^[A-Za-z_].*:\s*$", line):
-            in_terminal_colors = False
-            section = None
-
-        if re.match(r"^\s*background:\s*", line):
-            new_line, count = re.subn(
-                r"^(\s*background:\s*)(['\"]?)#?[0-9A-Fa-f]{6}\2",
-                lambda m: f"{m.group(1)}{m.group(2)}{ui['background']}{m.group(2)}",
-                line,
-            )
-            if count:
-                replaced["background"] = True
-                report.append(f"background -> {ui['background']}")
-            new_lines.append(new_line)
-            continue
-        if re.match(r"^\s*foreground:\s*", line):
-            new_line, count = re.subn(
-                r"^(\s*foreground:\s*)(['\"]?)#?[0-9A-Fa-f]{6}\2",
-                lambda m: f"{m.group(1)}{m.group(2)}{ui['foreground']}{m.group(2)}",
-                line,
-            )
-            if count:
-                replaced["foreground"] = True
-                report.append(f"foreground -> {ui['foreground']}")
-            new_lines.append(new_line)
-            continue
-        if re.match(r"^\s*accent:\s*", line):
-            new_line, count = re.subn(
-                r"^(\s*accent:\s*)(['\"]?)#?[0-9A-Fa-f]{6}\2",
-                lambda m: f"{m.group(1)}{m.group(2)}{ui['accent']}{m.group(2)}",
-                line,
-            )
-            if count:
-                replaced["accent"] = True
-                report.append(f"accent -> {ui['accent']}")
-            new_lines.append(new_line)
-            continue
-        if re.match(r"^\s*cursor:\s*", line):
-            new_line, count = re.subn(
-                r"^(\s*cursor:\s*)(['\"]?)#?[0-9A-Fa-f]{6}\2",
-                lambda m: f"{m.group(1)}{m.group(2)}{ui['cursor']}{m.group(2)}",
-                line,
-            )
-            if count:
-                replaced["cursor"] = True
-                report.append(f"cursor -> {ui['cursor']}")
-            new_lines.append(new_line)
-            continue
 
-        if section in ("normal", "bright"):
-            color_map = {
-                "black": 0,
-                "red": 1,
-                "green": 2,
-                "yellow": 3,
-                "blue": 4,
-                "magenta": 5,
-                "cyan": 6,
-                "white": 7,
-            }
-            for name, base_index in color_map.items():
-                if re.match(rf"^\s*{name}:\s*", line):
-                    index = base_index if section == "normal" else base_index + 8
-                    new_line, count = re.subn(
-                        rf"^(\s*{name}:\s*)(['\"]?)#?[0-9A-Fa-f]{{6}}\2",
-                        lambda m: f"{m.group(1)}{m.group(2)}{ansi[index]}{m.group(2)}",
-                        line,
-                    )
-                    if count:
-                        replaced[section].add(name)
-                        report.append(f"terminal_colors.{section}.{name} -> {ansi[index]}")
-                    new_lines.append(new_line)
-                    break
-            else:
-                new_lines.append(line)
-            continue
+# Shared driver for line-oriented formats. `rules` is a list of LineRule, or a
+# dict of section -> rules when a `track(line, section)` callback is given.
+# Matching produces a plan: literal text interleaved with slot placeholders,
+# which render_plan() fills in for a palette. Inside cached_plans(), plans are
+# reused for identical contents so rendering many palettes skips the regexes.
+def rewrite_lines(contents, rules, palette, track=None):
+    return render_plan(compile_lines(contents, rules, track), palette)
 
-        new_lines.append(line)
 
-    missing = []
-    for key in ("background", "foreground", "accent", "cursor"):
-        if not replaced[key]:
-            missing.append(key)
-    for section_name in ("normal", "bright"):
-        if len(replaced[section_name]) != 8:
-            missing.append(section_name)
-    if missing:
-        report.append("missing keys: " + ", ".join(missing))
+def rewrite_matches(contents, rule, palette):
+    return render_plan(compile_matches(contents, rule), palette)
 
-    return "".join(new_lines), report
 
+def split_lines(lines):
+    # Re-split an iterable of file lines the way str.splitlines() splits the
+    # whole text, so streamed and in-memory rewrites see the same lines.
+    search = LINE_BREAK_RE.search
+    for line in lines:
+        if search(line) is None:
+            yield line
+        else:
+            yield from line.splitlines(keepends=True)
 
-def update_colors_fish(contents, palette):
-    ansi = palette["ansi"]
-    ui = palette["ui"]
-    replaced = {"background": False, "foreground": False, "cursor": False, "colors": set()}
+
+# The streaming counterpart of rewrite_lines(): takes an iterable of lines and
+# writes the rewritten lines to `out` as it goes instead of returning the text,
+# so memory stays flat whatever the input size. Returns the report entries,
+# the replaced labels and whether any value actually changed.
+def stream_lines(lines, rules, palette, track, out):
+    replaced = set()
     report = []
-    lines = contents.splitlines(keepends=True)
-    new_lines = []
+    changed = False
+    write = out.write
+    section = None
+    table = rules
 
     for line in lines:
-        if re.match(r"^\s*set -U background\s+", line):
-            new_line, count = re.subn(
-                r"^(\s*set -U background\s+)'?#[0-9A-Fa-f]{6}'?",
-                lambda m: f"{m.group(1)}'{ui['background']}'",
-                line,
-            )
-            if count:
-                replaced["background"] = True
-                report.append(f"background -> {ui['background']}")
-            new_lines.append(new_line)
-            continue
-        if re.match(r"^\s*set -U foreground\s+", line):
-            new_line, count = re.subn(
-                r"^(\s*set -U foreground\s+)'?#[0-9A-Fa-f]{6}'?",
-                lambda m: f"{m.group(1)}'{ui['foreground']}'",
-                line,
-            )
-            if count:
-                replaced["foreground"] = True
-                report.append(f"foreground -> {ui['foreground']}")
-            new_lines.append(new_line)
-            continue
-        if re.match(r"^\s*set -U cursor\s+", line):
-            new_line, count = re.subn(
-                r"^(\s*set -U cursor\s+)'?#[0-9A-Fa-f]{6}'?",
-                lambda m: f"{m.group(1)}'{ui['cursor']}'",
-                line,
-            )
-            if count:
-                replaced["cursor"] = True
-                report.append(f"cursor -> {ui['cursor']}")
-            new_lines.append(new_line)
-            continue
-
-        color_match = re.match(r"^\s*set -U color(\d{1,2})\s+'?#?[0-9A-Fa-f]{6}'?", line)
-        if color_match:
-            index = int(color_match.group(1))
-            if index in ansi:
-                new_line = re.sub(
-                    r"^(\s*set -U color\d{1,2}\s+)'?#?[0-9A-Fa-f]{6}'?",
-                    lambda m: f"{m.group(1)}'{ansi[index]}'",
-                    line,
-                )
-                replaced["colors"].add(index)
-                report.append(f"color{index} -> {ansi[index]}")
-                new_lines.append(new_line)
+        if track is not None:
+            section, is_header = track(line, section)
+            if is_header:
+                write(line)
                 continue
+            table = rules.get(section, ())
 
-        new_lines.append(line)
-
-    missing = []
-    if not replaced["background"] or not replaced["foreground"] or not replaced["cursor"]:
-        missing.append("background/foreground/cursor")
-    missing_colors = [i for i in range(16) if i not in replaced["colors"]]
-    if missing_colors:
-        missing.append("colors: " + ", ".join(str(i) for i in missing_colors))
-    if missing:
-        report.append("missing keys: " + ", ".join(missing))
+        for rule in table:
+            match = rule.pattern.match(line)
+            if not match:
+                continue
+            placeholder = plan_placeholder(rule, match)
+            if placeholder is None:
+                write(line)
+                break
+            text, entry = render_placeholder(placeholder, palette)
+            start, end = match.span("value")
+            write(line[:start])
+            write(text)
+            write(line[end:])
+            if entry is not None:
+                replaced.add(placeholder[3])
+                report.append(entry)
+                if text != match.group("value"):
+                    changed = True
+            break
+        else:
+            write(line)
 
-    return "".join(new_lines), report
+    return report, replaced, changed
 
 
-def update_fzf_fish(contents, palette):
-    ansi = palette["ansi"]
+def splice_buffer(buffer, rule, palette, out):
+    # Like stream_lines(), for a bytes rule over a bytes-like buffer (e.g. an
+    # mmap) and a binary `out`. Copies the unchanged stretches between matches
+    # straight from the buffer; only keys and values are decoded.
     replaced = set()
     report = []
-    lines = contents.splitlines(keepends=True)
-    new_lines = []
-
-    for line in lines:
-        match = re.match(r"^(\s*set -l color)([0-9A-Fa-f]{2})\s+'?#?[0-9A-Fa-f]{6}'?", line)
-        if match:
-            index = int(match.group(2), 16)
-            if index in ansi:
-                new_line = re.sub(
-                    r"^(\s*set -l color[0-9A-Fa-f]{2}\s+)'?#?[0-9A-Fa-f]{6}'?",
-                    lambda m: f"{m.group(1)}'{ansi[index]}'",
-                    line,
-                )
-                replaced.add(index)
-                report.append(f"color{match.group(2).upper()} -> {ansi[index]}")
-                new_lines.append(new_line)
+    changed = False
+    position = 0
+    with memoryview(buffer) as view:
+        for match in rule.pattern.finditer(buffer):
+            key = match.group("key").decode("ascii")
+            if rule.normalize is not None:
+                key = rule.normalize(key)
+            slot = rule.slots.get(key)
+            if slot is None:
+                continue
+            label = rule.label.format(key=key)
+            text, entry = render_placeholder((rule, key, slot, label, match), palette)
+            if entry is None:
                 continue
+            start, end = match.span("value")
+            data = text.encode("utf-8")
+            if data != view[start:end]:
+                changed = True
+            out.write(view[position:start])
+            out.write(data)
+            position = end
+            replaced.add(label)
+            report.append(entry)
+        out.write(view[position:])
+
+    return report, replaced, changed
+
+
+def stream_update(update_fn, lines, out, palette):
+    """Rewrite `lines` as update_fn would, writing the result to `out`.
+
+    update_fn must be one of STREAMING_UPDATERS. Returns its report and
+    whether any value changed.
+    """
+    rules, track, finish = STREAMING_UPDATERS[update_fn]
+    report, replaced, changed = stream_lines(split_lines(lines), rules, palette, track, out)
+    return finish(report, replaced, palette), changed
+
+
+def splice_update(update_fn, buffer, out, palette):
+    """Like stream_update(), for one of BUFFER_UPDATERS over a bytes buffer."""
+    rule, finish = BUFFER_UPDATERS[update_fn]
+    report, replaced, changed = splice_buffer(buffer, rule, palette, out)
+    return finish(report, replaced, palette), changed
+
+
+@contextmanager
+def cached_plans():
+    previous = getattr(PLAN_CACHE, "plans", None)
+    if previous is None:
+        PLAN_CACHE.plans = {}
+    try:
+        yield
+    finally:
+        PLAN_CACHE.plans = previous
+
+
+def cached_plan(key, build):
+    plans = getattr(PLAN_CACHE, "plans", None)
+    if plans is None:
+        return build()
+    plan = plans.get(key)
+    if plan is None:
+        plan = plans[key] = build()
+    return plan
+
+
+def plan_placeholder(rule, match):
+    key = match.group("key")
+    if rule.normalize is not None:
+        key = rule.normalize(key)
+    slot = rule.slots.get(key)
+    if slot is None:
+        return None
+    return (rule, key, slot, rule.label.format(key=key), match)
 
-        new_lines.append(line)
 
-    missing = [i for i in range(16) if i not in replaced]
-    if missing:
-        report.append("missing color slots: " + ", ".join(f"{i:02X}" for i in missing))
+def compile_lines(contents, rules, track=None):
+    return cached_plan(
+        (id(rules), contents), lambda: build_line_plan(contents, rules, track)
+    )
 
-    return "".join(new_lines), report
 
+def build_line_plan(contents, rules, track):
+    plan = []
+    literal = []
+    section = None
+    table = rules
 
-def update_vencord(contents, palette):
-    base16_indexed = palette["base16_indexed"]
-    replaced = set()
-    report = []
+    for line in contents.splitlines(keepends=True):
+        if track is not None:
+            section, is_header = track(line, section)
+            if is_header:
+                literal.append(line)
+                continue
+            table = rules.get(section, ())
 
-    def repl(match):
-        index = int(match.group(1), 10)
-        if index in base16_indexed:
-            replaced.add(index)
-            return f"{match.group(0).split(':')[0]}: {base16_indexed[index]};"
-        return match.group(0)
-
-    updated = re.sub(r"--color(\d{2})\s*:\s*#?[0-9A-Fa-f]{6};", repl, contents)
-    for index in sorted(replaced):
-        report.append(f"--color{index:02d} -> {base16_indexed[index]}")
-    missing = [i for i in range(16) if i not in replaced]
-    if missing:
-        report.append("missing colors: " + ", ".join(str(i) for i in missing))
+        for rule in table:
+            match = rule.pattern.match(line)
+            if not match:
+                continue
+            placeholder = plan_placeholder(rule, match)
+            if placeholder is None:
+                literal.append(line)
+                break
+            start, end = match.span("value")
+            literal.append(line[:start])
+            plan.append("".join(literal))
+            plan.append(placeholder)
+            literal = [line[end:]]
+            break
+        else:
+            literal.append(line)
 
-    return updated, report
+    plan.append("".join(literal))
+    return plan
 
 
-def update_hyprland(contents, palette):
-    base16 = palette["base16"]
-    accent = base16["base0D"].lstrip("#")
-    replaced = False
-    skipped = False
+def compile_matches(contents, rule):
+    return cached_plan((id(rule), contents), lambda: build_match_plan(contents, rule))
+
+
+def build_match_plan(contents, rule):
+    plan = []
+    position = 0
+    for match in rule.pattern.finditer(contents):
+        placeholder = plan_placeholder(rule, match)
+        if placeholder is None:
+            continue
+        start, end = match.span("value")
+        plan.append(contents[position:start])
+        plan.append(placeholder)
+        position = end
+    plan.append(contents[position:])
+    return plan
+
+
+def render_placeholder(item, palette):
+    # Returns the replacement text and its report entry; a renderer returning
+    # None keeps the original value and reports nothing.
+    rule, key, slot, label, match = item
+    value = palette[slot[0]][slot[1]]
+    encoded = value if rule.encoding is None else palette.encode(slot, rule.encoding)
+    text = encoded if rule.render is None else rule.render(key, encoded, match)
+    if text is None:
+        return match.group("value"), None
+    return text, rule.report.format(label=label, value=value, text=text)
+
+
+def render_plan(plan, palette):
+    replaced = set()
     report = []
-    lines = contents.splitlines(keepends=True)
-    new_lines = []
+    output = []
 
-    for line in lines:
-        if re.match(r"^\s*\$activeBorderColor\s*=", line):
-            rgb_values = re.findall(r"rgb\([0-9A-Fa-f]{6}\)", line)
-            if len(rgb_values) != 1 or re.search(r"\bdeg\b", line):
-                skipped = True
-                report.append("skipped $activeBorderColor (gradient)")
-                new_lines.append(line)
-                continue
-            new_line, count = re.subn(
-                r"^(\s*\$activeBorderColor\s*=\s*)rgb\([0-9A-Fa-f]{6}\)",
-                lambda m: f"{m.group(1)}rgb({accent})",
-                line,
-            )
-            if count:
-                replaced = True
-                report.append(f"$activeBorderColor -> #{accent}")
-            new_lines.append(new_line)
+    for item in plan:
+        if item.__class__ is str:
+            output.append(item)
             continue
-        new_lines.append(line)
+        text, entry = render_placeholder(item, palette)
+        output.append(text)
+        if entry is not None:
+            replaced.add(item[3])
+            report.append(entry)
 
-    if not replaced and not skipped:
-        report.append("missing $activeBorderColor")
+    return "".join(output), report, replaced
 
-    return "".join(new_lines), report
 
+class Missing(str):
+    """A "missing ..." report entry that also carries the missing key names.
 
-def update_hyprlock(contents, palette):
-    base16 = palette["base16"]
-    targets = {
-        "$color": base16["base00"],
-        "$inner_color": base16["base00"],
-        "$outer_color": base16["base0D"],
-        "$font_color": base16["base07"],
-        "$placeholder_color": base16["base07"],
-        "$check_color": base16["base0E"],
-    }
-    replaced = set()
-    report = []
-    lines = contents.splitlines(keepends=True)
-    new_lines = []
+    It prints as its summary; structured reports list its keys instead.
+    """
 
-    for line in lines:
-        line_replaced = False
-        for name, hex_color in targets.items():
-            if re.match(rf"^\s*{re.escape(name)}\s*=", line):
-                rgb = hex_to_rgb(hex_color)
-                if not rgb:
-                    new_lines.append(line)
-                    line_replaced = True
-                    break
-                r, g, b = rgb
-                new_line, count = re.subn(
-                    rf"^(\s*{re.escape(name)}\s*=\s*rgba\()\s*\d+\s*,\s*\d+\s*,\s*\d+\s*,\s*([0-9.]+)\s*\)",
-                    lambda m: f"{m.group(1)}{r}, {g}, {b}, {m.group(2)})",
-                    line,
-                )
-                if count == 0:
-                    new_line, count = re.subn(
-                        rf"^(\s*{re.escape(name)}\s*=\s*rgba\()\s*\d+\s*,\s*\d+\s*,\s*\d+\s*\)",
-                        lambda m: f"{m.group(1)}{r}, {g}, {b}, 1)",
-                        line,
-                    )
-                if count:
-                    replaced.add(name)
-                    report.append(f"{name} -> {hex_color}")
-                new_lines.append(new_line)
-                line_replaced = True
-                break
-        if line_replaced:
-            continue
-        new_lines.append(line)
+    def __new__(cls, summary, keys):
+        entry = super().__new__(cls, f"missing {summary}")
+        entry.keys = list(keys)
+        return entry
+
+    def __reduce__(self):
+        return (Missing, (self[len("missing ") :], self.keys))
 
-    missing = [name for name in targets.keys() if name not in replaced]
+
+def dump_report(report):
+    # JSON form of a report: Missing entries become [entry, keys] pairs.
+    return [[entry, entry.keys] if isinstance(entry, Missing) else entry for entry in report]
+
+
+def load_report(entries):
+    return [
+        Missing(entry[0][len("missing ") :], entry[1]) if isinstance(entry, list) else entry
+        for entry in entries
+    ]
+
+
+# Updaters finish their report from the labels their rules replaced with a
+# finish_<format>(report, replaced, palette) function, shared with the
+# streaming and buffer paths (see stream_update). Formats that only need every
+# slot of a table replaced use finish_slots.
+def finish_slots(slots, report, replaced, palette):
+    missing = [name for name in slots if name not in replaced]
     if missing:
-        report.append("missing keys: " + ", ".join(missing))
+        report.append(Missing("keys: " + ", ".join(missing), missing))
+    return report
 
-    return "".join(new_lines), report
 
+GHOSTTY_RULES = [
+    line_rule(
+        rf"^\s*(?P<key>background|foreground)\s*=\s*(?P<value>{HEX})",
+        {"background": ("ui", "background"), "foreground": ("ui", "foreground")},
+    ),
+    line_rule(
+        rf"^\s*palette\s*=\s*(?P<value>(?P<key>\d+)={HEX})",
+        ANSI_SLOTS,
+        label="palette[{key}]",
+        render=lambda key, value, match: f"{key}={value}",
+        normalize=int,
+    ),
+]
 
-def update_mako(contents, palette):
-    base16 = palette["base16"]
-    targets = {
-        "text-color": base16["base07"],
-        "border-color": base16["base0D"],
-        "background-color": base16["base00"],
-    }
-    replaced = set()
-    report = []
-    lines = contents.splitlines(keepends=True)
-    new_lines = []
 
-    for line in lines:
-        matched = False
-        for key, value in targets.items():
-            if re.match(rf"^\s*{re.escape(key)}\s*=", line):
-                new_line, count = re.subn(
-                    rf"^(\s*{re.escape(key)}\s*=\s*)#?[0-9A-Fa-f]{{6}}",
-                    lambda m: f"{m.group(1)}{value}",
-                    line,
-                )
-                if count:
-                    replaced.add(key)
-                    report.append(f"{key} -> {value}")
-                new_lines.append(new_line)
-                matched = True
-                break
-        if matched:
-            continue
-        new_lines.append(line)
+def update_ghostty(contents, palette):
+    updated, report, replaced = rewrite_lines(contents, GHOSTTY_RULES, palette)
+    return updated, finish_ghostty(report, replaced, palette)
+
 
-    missing = [key for key in targets.keys() if key not in replaced]
+def finish_ghostty(report, replaced, palette):
+    missing = [key for key in ("background", "foreground") if key not in replaced]
+    missing_palette = [i for i in range(16) if f"palette[{i}]" not in replaced]
     if missing:
-        report.append("missing keys: " + ", ".join(missing))
+        report.append(Missing("keys: " + ", ".join(missing), missing))
+    if missing_palette:
+        report.append(
+            Missing(
+                "palette indexes: " + ", ".join(str(i) for i in missing_palette),
+                [f"palette[{i}]" for i in missing_palette],
+            )
+        )
+    return report
 
-    return "".join(new_lines), report
 
+NEOVIM_RULE = line_rule(
+    rf"\b(?P<key>{key_alternation(NEOVIM_KEYS)})\s*=\s*['\"]?(?P<value>#[0-9A-Fa-f]{{6}})",
+    {key: ("neovim", key) for key in NEOVIM_KEYS},
+)
 
-def update_waybar(contents, palette):
-    base16 = palette["base16"]
-    targets = {
-        "background": base16["base00"],
-        "foreground": base16["base05"],
-    }
-    replaced = set()
-    report = []
-    lines = contents.splitlines(keepends=True)
-    new_lines = []
 
-    for line in lines:
-        matched = False
-        for name, value in targets.items():
-            if re.match(rf"^\s*@define-color\s+{re.escape(name)}\s+", line):
-                new_line, count = re.subn(
-                    rf"^(\s*@define-color\s+{re.escape(name)}\s+)#?[0-9A-Fa-f]{{6}}(\s*;)",
-                    lambda m: f"{m.group(1)}{value}{m.group(2)}",
-                    line,
-                )
-                if count:
-                    replaced.add(name)
-                    report.append(f"{name} -> {value}")
-                new_lines.append(new_line)
-                matched = True
-                break
-        if matched:
-            continue
-        new_lines.append(line)
+def update_neovim(contents, palette):
+    neovim = palette["neovim"]
+    updated, _, replaced = rewrite_matches(contents, NEOVIM_RULE, palette)
+    report = [f"{key} -> {value}" for key, value in neovim.items() if key in replaced]
+
+    return updated, report
+
+
+TOML_HEADER_RE = lazy_re(r"^\s*\[(.+)\]\s*$")
+
+
+def track_toml_section(line, section):
+    match = TOML_HEADER_RE.match(line)
+    if match:
+        return match.group(1).strip(), True
+    return section, False
+
+
+def quoted_color_rule(separator, slots, label):
+    return line_rule(
+        rf"^\s*(?P<key>{key_alternation(slots)}){separator}(?P<q>['\"]?)(?P<value>{HEX})(?P=q)",
+        slots,
+        label=label,
+    )
+
+ALACRITTY_RULES = {
+    "colors.primary": [
+        quoted_color_rule(
+            r"\s*=\s*",
+            {"background": ("ui", "background"), "foreground": ("ui", "foreground")},
+            "colors.primary.{key}",
+        ),
+    ],
+    "colors.cursor": [
+        quoted_color_rule(
+            r"\s*=\s*",
+            {"text": ("ui", "background"), "cursor": ("ui", "cursor")},
+            "colors.cursor.{key}",
+        ),
+    ],
+    "colors.normal": [
+        quoted_color_rule(
+            r"\s*=\s*",
+            {name: ("ansi", i) for i, name in enumerate(ANSI_COLOR_NAMES)},
+            "colors.normal.{key}",
+        ),
+    ],
+    "colors.bright": [
+        quoted_color_rule(
+            r"\s*=\s*",
+            {name: ("ansi", i + 8) for i, name in enumerate(ANSI_COLOR_NAMES)},
+            "colors.bright.{key}",
+        ),
+    ],
+}
+
+
+def update_alacritty(contents, palette):
+    updated, report, replaced = rewrite_lines(
+        contents, ALACRITTY_RULES, palette, track=track_toml_section
+    )
+    return updated, finish_alacritty(report, replaced, palette)
 
-    missing = [name for name in targets.keys() if name not in replaced]
+
+def finish_alacritty(report, replaced, palette):
+    required = [
+        ("colors.primary", ("background", "foreground")),
+        ("colors.cursor", ("text", "cursor")),
+        ("colors.normal", ANSI_COLOR_NAMES),
+        ("colors.bright", ANSI_COLOR_NAMES),
+    ]
+    missing = []
+    keys = []
+    for section, names in required:
+        absent = [f"{section}.{name}" for name in names if f"{section}.{name}" not in replaced]
+        if absent:
+            missing.append(section)
+            keys += absent
     if missing:
-        report.append("missing keys: " + ", ".join(missing))
+        report.append(Missing("sections/keys: " + ", ".join(missing), keys))
+    return report
 
-    return "".join(new_lines), report
 
+KITTY_RULES = [
+    line_rule(
+        rf"^\s*(?P<key>background|foreground)\s+(?P<value>{HEX})",
+        {"background": ("ui", "background"), "foreground": ("ui", "foreground")},
+    ),
+    line_rule(
+        rf"^\s*color(?P<key>\d{{1,2}})\s+(?P<value>{HEX})",
+        ANSI_SLOTS,
+        label="color{key}",
+        normalize=int,
+    ),
+]
 
-def update_wofi(contents, palette):
-    base16 = palette["base16"]
-    targets = {
-        "bg": base16["base00"],
-        "fg": base16["base05"],
-        "gray1": base16["base01"],
-        "gray2": base16["base02"],
-        "gray3": base16["base03"],
-        "gray4": base16["base04"],
-        "gray5": base16["base05"],
-        "fg_bright": base16["base07"],
-    }
-    replaced = set()
-    report = []
-    lines = contents.splitlines(keepends=True)
-    new_lines = []
 
-    for line in lines:
-        matched = False
-        for name, value in targets.items():
-            if re.match(rf"^\s*@define-color\s+{re.escape(name)}\s+", line):
-                new_line, count = re.subn(
-                    rf"^(\s*@define-color\s+{re.escape(name)}\s+)#?[0-9A-Fa-f]{{6}}(\s*;)",
-                    lambda m: f"{m.group(1)}{value}{m.group(2)}",
-                    line,
-                )
-                if count:
-                    replaced.add(name)
-                    report.append(f"{name} -> {value}")
-                new_lines.append(new_line)
-                matched = True
-                break
-        if matched:
-            continue
-        new_lines.append(line)
+def update_kitty(contents, palette):
+    updated, report, replaced = rewrite_lines(contents, KITTY_RULES, palette)
+    return updated, finish_kitty(report, replaced, palette)
 
-    missing = [name for name in targets.keys() if name not in replaced]
+
+def finish_kitty(report, replaced, palette):
+    missing = []
+    keys = [key for key in ("background", "foreground") if key not in replaced]
+    if keys:
+        missing.append("background/foreground")
+    missing_colors = [i for i in range(16) if f"color{i}" not in replaced]
+    if missing_colors:
+        missing.append("colors: " + ", ".join(str(i) for i in missing_colors))
+        keys += [f"color{i}" for i in missing_colors]
     if missing:
-        report.append("missing keys: " + ", ".join(missing))
+        report.append(Missing("keys: " + ", ".join(missing), keys))
+    return report
 
-    return "".join(new_lines), report
 
+WARP_TERMINAL_COLORS_RE = lazy_re(r"^\s*terminal_colors:\s*$")
+WARP_SECTION_RE = lazy_re(r"^\s*(normal|bright):\s*$")
+WARP_TOP_LEVEL_RE = lazy_re(r"^[A-Za-z_].*:\s*$")
 
-def update_walker(contents, palette):
-    base16 = palette["base16"]
-    targets = {
-        "selected-text": base16["base0D"],
-        "text": base16["base05"],
-        "base": base16["base00"],
-        "border": base16["base02"],
-        "foreground": base16["base05"],
-        "background": base16["base00"],
-    }
-    replaced = set()
-    report = []
-    lines = contents.splitlines(keepends=True)
-    new_lines = []
 
-    for line in lines:
-        matched = False
-        for name, value in targets.items():
-            if re.match(rf"^\s*@define-color\s+{re.escape(name)}\s+", line):
-                new_line, count = re.subn(
-                    rf"^(\s*@define-color\s+{re.escape(name)}\s+)#?[0-9A-Fa-f]{{6}}(\s*;)",
-                    lambda m: f"{m.group(1)}{value}{m.group(2)}",
-                    line,
-                )
-                if count:
-                    replaced.add(name)
-                    report.append(f"{name} -> {value}")
-                new_lines.append(new_line)
-                matched = True
-                break
-        if matched:
-            continue
-        new_lines.append(line)
+def track_warp_section(line, section):
+    if WARP_TERMINAL_COLORS_RE.match(line):
+        return "terminal_colors", True
+    if section is not None:
+        match = WARP_SECTION_RE.match(line)
+        if match:
+            return match.group(1), True
+    if WARP_TOP_LEVEL_RE.match(line):
+        return None, False
+    return section, False
+
+
+WARP_UI_RULE = quoted_color_rule(
+    r":\s*",
+    {
+        "background": ("ui", "background"),
+        "foreground": ("ui", "foreground"),
+        "accent": ("ui", "accent"),
+        "cursor": ("ui", "cursor"),
+    },
+    "{key}",
+)
+
+WARP_RULES = {
+    None: [WARP_UI_RULE],
+    "terminal_colors": [WARP_UI_RULE],
+    "normal": [
+        WARP_UI_RULE,
+        quoted_color_rule(
+            r":\s*",
+            {name: ("ansi", i) for i, name in enumerate(ANSI_COLOR_NAMES)},
+            "terminal_colors.normal.{key}",
+        ),
+    ],
+    "bright": [
+        WARP_UI_RULE,
+        quoted_color_rule(
+            r":\s*",
+            {name: ("ansi", i + 8) for i, name in enumerate(ANSI_COLOR_NAMES)},
+            "terminal_colors.bright.{key}",
+        ),
+    ],
+}
+
 
-    missing = [name for name in targets.keys() if name not in replaced]
+def update_warp(contents, palette):
+    updated, report, replaced = rewrite_lines(
+        contents, WARP_RULES, palette, track=track_warp_section
+    )
+    return updated, finish_warp(report, replaced, palette)
+
+
+def finish_warp(report, replaced, palette):
+    missing = [
+        key for key in ("background", "foreground", "accent", "cursor") if key not in replaced
+    ]
+    keys = list(missing)
+    for section_name in ("normal", "bright"):
+        labels = [f"terminal_colors.{section_name}.{name}" for name in ANSI_COLOR_NAMES]
+        labels = [label for label in labels if label not in replaced]
+        if labels:
+            missing.append(section_name)
+            keys += labels
     if missing:
-        report.append("missing keys: " + ", ".join(missing))
+        report.append(Missing("keys: " + ", ".join(missing), keys))
+    return report
 
-    return "".join(new_lines), report
 
+COLORS_FISH_RULES = [
+    line_rule(
+        r"^\s*set -U (?P<key>background|foreground|cursor)\s+(?P<value>'?#[0-9A-Fa-f]{6}'?)",
+        {
+            "background": ("ui", "background"),
+            "foreground": ("ui", "foreground"),
+            "cursor": ("ui", "cursor"),
+        },
+        render=quote_value,
+    ),
+    line_rule(
+        rf"^\s*set -U color(?P<key>\d{{1,2}})\s+(?P<value>'?{HEX}'?)",
+        ANSI_SLOTS,
+        label="color{key}",
+        render=quote_value,
+        normalize=int,
+    ),
+]
 
-def update_swayosd(contents, palette):
-    base16 = palette["base16"]
-    targets = {
-        "background-color": base16["base00"],
-        "border-color": base16["base02"],
-        "label": base16["base05"],
-        "image": base16["base05"],
-        "progress": base16["base0B"],
-    }
-    replaced = set()
-    report = []
-    lines = contents.splitlines(keepends=True)
-    new_lines = []
 
-    for line in lines:
-        matched = False
-        for name, value in targets.items():
-            if re.match(rf"^\s*@define-color\s+{re.escape(name)}\s+", line):
-                new_line, count = re.subn(
-                    rf"^(\s*@define-color\s+{re.escape(name)}\s+)#?[0-9A-Fa-f]{{6}}(\s*;)",
-                    lambda m: f"{m.group(1)}{value}{m.group(2)}",
-                    line,
-                )
-                if count:
-                    replaced.add(name)
-                    report.append(f"{name} -> {value}")
-                new_lines.append(new_line)
-                matched = True
-                break
-        if matched:
-            continue
-        new_lines.append(line)
+def update_colors_fish(contents, palette):
+    updated, report, replaced = rewrite_lines(contents, COLORS_FISH_RULES, palette)
+    return updated, finish_colors_fish(report, replaced, palette)
+
 
-    missing = [name for name in targets.keys() if name not in replaced]
+def finish_colors_fish(report, replaced, palette):
+    missing = []
+    keys = [key for key in ("background", "foreground", "cursor") if key not in replaced]
+    if keys:
+        missing.append("background/foreground/cursor")
+    missing_colors = [i for i in range(16) if f"color{i}" not in replaced]
+    if missing_colors:
+        missing.append("colors: " + ", ".join(str(i) for i in missing_colors))
+        keys += [f"color{i}" for i in missing_colors]
     if missing:
-        report.append("missing keys: " + ", ".join(missing))
+        report.append(Missing("keys: " + ", ".join(missing), keys))
+    return report
 
-    return "".join(new_lines), report
 
+FZF_FISH_RULES = [
+    line_rule(
+        rf"^\s*set -l color(?P<key>[0-9A-Fa-f]{{2}})\s+(?P<value>'?{HEX}'?)",
+        ANSI_SLOTS,
+        label="color{key:02X}",
+        render=quote_value,
+        normalize=lambda key: int(key, 16),
+    ),
+]
 
-def update_btop(contents, palette):
-    base16 = palette["base16"]
-    targets = {
-        "main_bg": base16["base00"],
-        "main_fg": base16["base05"],
-        "title": base16["base0D"],
-        "hi_fg": base16["base0E"],
-        "selected_bg": base16["base01"],
-        "selected_fg": base16["base05"],
-        "inactive_fg": base16["base02"],
-        "proc_misc": base16["base0D"],
-        "cpu_box": base16["base0A"],
-        "mem_box": base16["base0A"],
-        "net_box": base16["base0A"],
-        "proc_box": base16["base0A"],
-        "div_line": base16["base02"],
-        "temp_start": base16["base0E"],
-        "temp_mid": base16["base0D"],
-        "temp_end": base16["base0A"],
-        "cpu_start": base16["base0E"],
-        "cpu_mid": base16["base0D"],
-        "cpu_end": base16["base0A"],
-        "free_start": base16["base0D"],
-        "free_mid": base16["base0B"],
-        "free_end": base16["base0B"],
-        "cached_start": base16["base0B"],
-        "cached_mid": base16["base0B"],
-        "cached_end": base16["base0B"],
-        "available_start": base16["base0E"],
-        "available_mid": base16["base0E"],
-        "available_end": base16["base0E"],
-        "used_start": base16["base0A"],
-        "used_mid": base16["base0A"],
-        "used_end": base16["base0A"],
-        "download_start": base16["base0B"],
-        "download_mid": base16["base0E"],
-        "download_end": base16["base0D"],
-        "upload_start": base16["base0B"],
-        "upload_mid": base16["base0E"],
-        "upload_end": base16["base0D"],
-    }
-    replaced = set()
-    report = []
-    lines = contents.splitlines(keepends=True)
-    new_lines = []
 
-    for line in lines:
-        match = re.match(r'^\s*theme\[([^\]]+)\]\s*=\s*"#?[0-9A-Fa-f]{6}"', line)
-        if match:
-            key = match.group(1)
-            if key in targets:
-                value = targets[key]
-                new_line, count = re.subn(
-                    r'^(\s*theme\[[^\]]+\]\s*=\s*")#?[0-9A-Fa-f]{6}(")',
-                    lambda m: f"{m.group(1)}{value}{m.group(2)}",
-                    line,
-                )
-                if count:
-                    replaced.add(key)
-                    report.append(f"{key} -> {value}")
-                    new_lines.append(new_line)
-                    continue
-        new_lines.append(line)
+def update_fzf_fish(contents, palette):
+    updated, report, replaced = rewrite_lines(contents, FZF_FISH_RULES, palette)
+    return updated, finish_fzf_fish(report, replaced, palette)
+
 
-    missing = [key for key in targets.keys() if key not in replaced]
+def finish_fzf_fish(report, replaced, palette):
+    missing = [i for i in range(16) if f"color{i:02X}" not in replaced]
     if missing:
-        report.append("missing keys: " + ", ".join(missing))
+        report.append(
+            Missing(
+                "color slots: " + ", ".join(f"{i:02X}" for i in missing),
+                [f"color{i:02X}" for i in missing],
+            )
+        )
+    return report
 
-    return "".join(new_lines), report
 
+VENCORD_RULE = line_rule(
+    rf"--color(?P<key>\d{{2}})\s*:(?P<value>\s*{HEX};)",
+    {i: ("base16_indexed", i) for i in range(16)},
+    label="--color{key:02d}",
+    render=lambda key, value, match: f" {value};",
+    normalize=int,
+)
 
-def update_cava(contents, palette):
-    base16 = palette["base16"]
-    gradient = [
-        base16["base0D"],
-        base16["base0C"],
-        base16["base0B"],
-        base16["base0A"],
-        base16["base09"],
-        base16["base08"],
-        base16["base0E"],
-        base16["base0F"],
+
+def update_vencord(contents, palette):
+    updated, report, replaced = rewrite_matches(contents, VENCORD_RULE, palette)
+    return updated, finish_vencord(report, replaced, palette)
+
+
+def finish_vencord(report, replaced, palette):
+    # One entry per colour, however often the file sets it.
+    base16_indexed = palette["base16_indexed"]
+    report = [
+        f"--color{i:02d} -> {base16_indexed[i]}" for i in range(16) if f"--color{i:02d}" in replaced
     ]
-    replaced = set()
+    missing = [i for i in range(16) if f"--color{i:02d}" not in replaced]
+    if missing:
+        report.append(
+            Missing(
+                "colors: " + ", ".join(str(i) for i in missing),
+                [f"--color{i:02d}" for i in missing],
+            )
+        )
+    return report
+
+
+HYPRLAND_BORDER_RE = lazy_re(r"^(\s*\$activeBorderColor\s*=\s*)rgb\([0-9A-Fa-f]{6}\)")
+HYPRLAND_BORDER_KEY_RE = lazy_re(r"^\s*\$activeBorderColor\s*=")
+HYPRLAND_RGB_RE = lazy_re(r"rgb\([0-9A-Fa-f]{6}\)")
+HYPRLAND_DEG_RE = lazy_re(r"\bdeg\b")
+
+
+def update_hyprland(contents, palette):
+    accent = palette.encode(("base16", "base0D"), "bare")
+    replaced = False
+    skipped = False
     report = []
     lines = contents.splitlines(keepends=True)
     new_lines = []
 
     for line in lines:
-        match = re.match(r"^\s*gradient_color_(\d+)\s*=\s*'#[0-9A-Fa-f]{6}'", line)
-        if match:
-            idx = int(match.group(1))
-            if 1 <= idx <= len(gradient):
-                value = gradient[idx - 1]
-                new_line, count = re.subn(
-                    r"^(\s*gradient_color_\d+\s*=\s*')#?[0-9A-Fa-f]{6}(')",
-                    lambda m: f"{m.group(1)}{value}{m.group(2)}",
-                    line,
-                )
-                if count:
-                    replaced.add(idx)
-                    report.append(f"gradient_color_{idx} -> {value}")
-                    new_lines.append(new_line)
-                    continue
+        if HYPRLAND_BORDER_KEY_RE.match(line):
+            rgb_values = HYPRLAND_RGB_RE.findall(line)
+            if len(rgb_values) != 1 or HYPRLAND_DEG_RE.search(line):
+                skipped = True
+                report.append("skipped $activeBorderColor (gradient)")
+                new_lines.append(line)
+                continue
+            new_line, count = HYPRLAND_BORDER_RE.subn(
+                lambda m: f"{m.group(1)}rgb({accent})",
+                line,
+            )
+            if count:
+                replaced = True
+                report.append(f"$activeBorderColor -> #{accent}")
+            new_lines.append(new_line)
+            continue
         new_lines.append(line)
 
-    missing = [i for i in range(1, 9) if i not in replaced]
-    if missing:
-        report.append("missing keys: " + ", ".join(str(i) for i in missing))
+    if not replaced and not skipped:
+        report.append(Missing("$activeBorderColor", ["$activeBorderColor"]))
 
     return "".join(new_lines), report
 
 
-def update_chromium(contents, palette):
-    base16 = palette["base16"]
-    rgb = hex_to_rgb(base16["base00"])
-    if not rgb:
-        return contents, ["missing base00"]
-    r, g, b = rgb
-    value = f"{r},{g},{b}"
-    report = [f"chromium.theme -> {value}"]
-    return value + "\n", report
+def render_rgba(key, value, match):
+    return f"{value}, {match.group('alpha') or 1})"
 
 
-def update_gtk_css(contents, palette):
-    base16 = palette["base16"]
-    targets = build_gtk_ui_colors(base16)
-    replaced = set()
-    report = []
-    lines = contents.splitlines(keepends=True)
-    new_lines = []
+HYPRLOCK_SLOTS = {
+    "$color": ("base16", "base00"),
+    "$inner_color": ("base16", "base00"),
+    "$outer_color": ("base16", "base0D"),
+    "$font_color": ("base16", "base07"),
+    "$placeholder_color": ("base16", "base07"),
+    "$check_color": ("base16", "base0E"),
+}
+
+HYPRLOCK_RULES = [
+    line_rule(
+        rf"^\s*(?P<key>{key_alternation(HYPRLOCK_SLOTS)})\s*=\s*rgba\("
+        r"(?P<value>\s*\d+\s*,\s*\d+\s*,\s*\d+\s*(?:,\s*(?P<alpha>[0-9.]+)\s*)?\))",
+        HYPRLOCK_SLOTS,
+        render=render_rgba,
+        encoding="rgb",
+    ),
+]
+
+
+def update_hyprlock(contents, palette):
+    updated, report, replaced = rewrite_lines(contents, HYPRLOCK_RULES, palette)
+    return updated, finish_slots(HYPRLOCK_SLOTS, report, replaced, palette)
+
+
+MAKO_SLOTS = {
+    "text-color": ("base16", "base07"),
+    "border-color": ("base16", "base0D"),
+    "background-color": ("base16", "base00"),
+}
+
+MAKO_RULES = [
+    line_rule(
+        rf"^\s*(?P<key>{key_alternation(MAKO_SLOTS)})\s*=\s*(?P<value>{HEX})",
+        MAKO_SLOTS,
+    ),
+]
+
+
+def update_mako(contents, palette):
+    updated, report, replaced = rewrite_lines(contents, MAKO_RULES, palette)
+    return updated, finish_slots(MAKO_SLOTS, report, replaced, palette)
+
+
+# All @define-color updaters share one pattern; the token after
+# `@define-color` is looked up in the format's slot dict.
+DEFINE_COLOR_RE = lazy_re(rf"^\s*@define-color\s+(?P<key>\S+)\s+(?P<value>{HEX})\s*;")
+
+
+def define_color_rules(slots):
+    return [line_rule(DEFINE_COLOR_RE, slots)]
+
+
+def update_define_colors(contents, palette, rules, slots):
+    updated, report, replaced = rewrite_lines(contents, rules, palette)
+    return updated, finish_slots(slots, report, replaced, palette)
+
+
+WAYBAR_SLOTS = {
+    "background": ("base16", "base00"),
+    "foreground": ("base16", "base05"),
+}
+
+WAYBAR_RULES = define_color_rules(WAYBAR_SLOTS)
+
+
+def update_waybar(contents, palette):
+    return update_define_colors(contents, palette, WAYBAR_RULES, WAYBAR_SLOTS)
+
+
+WOFI_SLOTS = {
+    "bg": ("base16", "base00"),
+    "fg": ("base16", "base05"),
+    "gray1": ("base16", "base01"),
+    "gray2": ("base16", "base02"),
+    "gray3": ("base16", "base03"),
+    "gray4": ("base16", "base04"),
+    "gray5": ("base16", "base05"),
+    "fg_bright": ("base16", "base07"),
+}
+
+WOFI_RULES = define_color_rules(WOFI_SLOTS)
+
+
+def update_wofi(contents, palette):
+    return update_define_colors(contents, palette, WOFI_RULES, WOFI_SLOTS)
+
+
+WALKER_SLOTS = {
+    "selected-text": ("base16", "base0D"),
+    "text": ("base16", "base05"),
+    "base": ("base16", "base00"),
+    "border": ("base16", "base02"),
+    "foreground": ("base16", "base05"),
+    "background": ("base16", "base00"),
+}
+
+WALKER_RULES = define_color_rules(WALKER_SLOTS)
+
+
+def update_walker(contents, palette):
+    return update_define_colors(contents, palette, WALKER_RULES, WALKER_SLOTS)
+
+
+SWAYOSD_SLOTS = {
+    "background-color": ("base16", "base00"),
+    "border-color": ("base16", "base02"),
+    "label": ("base16", "base05"),
+    "image": ("base16", "base05"),
+    "progress": ("base16", "base0B"),
+}
+
+SWAYOSD_RULES = define_color_rules(SWAYOSD_SLOTS)
+
+
+def update_swayosd(contents, palette):
+    return update_define_colors(contents, palette, SWAYOSD_RULES, SWAYOSD_SLOTS)
+
+
+BTOP_SLOTS = {
+    "main_bg": ("base16", "base00"),
+    "main_fg": ("base16", "base05"),
+    "title": ("base16", "base0D"),
+    "hi_fg": ("base16", "base0E"),
+    "selected_bg": ("base16", "base01"),
+    "selected_fg": ("base16", "base05"),
+    "inactive_fg": ("base16", "base02"),
+    "proc_misc": ("base16", "base0D"),
+    "cpu_box": ("base16", "base0A"),
+    "mem_box": ("base16", "base0A"),
+    "net_box": ("base16", "base0A"),
+    "proc_box": ("base16", "base0A"),
+    "div_line": ("base16", "base02"),
+    "temp_start": ("base16", "base0E"),
+    "temp_mid": ("base16", "base0D"),
+    "temp_end": ("base16", "base0A"),
+    "cpu_start": ("base16", "base0E"),
+    "cpu_mid": ("base16", "base0D"),
+    "cpu_end": ("base16", "base0A"),
+    "free_start": ("base16", "base0D"),
+    "free_mid": ("base16", "base0B"),
+    "free_end": ("base16", "base0B"),
+    "cached_start": ("base16", "base0B"),
+    "cached_mid": ("base16", "base0B"),
+    "cached_end": ("base16", "base0B"),
+    "available_start": ("base16", "base0E"),
+    "available_mid": ("base16", "base0E"),
+    "available_end": ("base16", "base0E"),
+    "used_start": ("base16", "base0A"),
+    "used_mid": ("base16", "base0A"),
+    "used_end": ("base16", "base0A"),
+    "download_start": ("base16", "base0B"),
+    "download_mid": ("base16", "base0E"),
+    "download_end": ("base16", "base0D"),
+    "upload_start": ("base16", "base0B"),
+    "upload_mid": ("base16", "base0E"),
+    "upload_end": ("base16", "base0D"),
+}
+
+BTOP_RULES = [
+    line_rule(
+        rf'^\s*theme\[(?P<key>[^\]]+)\]\s*=\s*"(?P<value>{HEX})"',
+        BTOP_SLOTS,
+    ),
+]
+
+
+def update_btop(contents, palette):
+    updated, report, replaced = rewrite_lines(contents, BTOP_RULES, palette)
+    return updated, finish_slots(BTOP_SLOTS, report, replaced, palette)
+
+
+CAVA_RULES = [
+    line_rule(
+        r"^\s*gradient_color_(?P<key>\d+)\s*=\s*'(?P<value>#[0-9A-Fa-f]{6})'",
+        {
+            1: ("base16", "base0D"),
+            2: ("base16", "base0C"),
+            3: ("base16", "base0B"),
+            4: ("base16", "base0A"),
+            5: ("base16", "base09"),
+            6: ("base16", "base08"),
+            7: ("base16", "base0E"),
+            8: ("base16", "base0F"),
+        },
+        label="gradient_color_{key}",
+        normalize=int,
+    ),
+]
+
+
+def update_cava(contents, palette):
+    updated, report, replaced = rewrite_lines(contents, CAVA_RULES, palette)
+    return updated, finish_cava(report, replaced, palette)
 
-    for line in lines:
-        matched = False
-        for name, value in targets.items():
-            if re.match(rf"^\s*@define-color\s+{re.escape(name)}\s+", line):
-                new_line, count = re.subn(
-                    rf"^(\s*@define-color\s+{re.escape(name)}\s+)#?[0-9A-Fa-f]{{6}}(\s*;)",
-                    lambda m: f"{m.group(1)}{value}{m.group(2)}",
-                    line,
-                )
-                if count:
-                    replaced.add(name)
-                    report.append(f"{name} -> {value}")
-                new_lines.append(new_line)
-                matched = True
-                break
-        if matched:
-            continue
-        new_lines.append(line)
 
-    missing = [name for name in targets.keys() if name not in replaced]
+def finish_cava(report, replaced, palette):
+    missing = [i for i in range(1, 9) if f"gradient_color_{i}" not in replaced]
     if missing:
-        report.append("missing keys: " + ", ".join(missing))
+        report.append(
+            Missing(
+                "keys: " + ", ".join(str(i) for i in missing),
+                [f"gradient_color_{i}" for i in missing],
+            )
+        )
+    return report
 
-    return "".join(new_lines), report
+
+def update_chromium(contents, palette):
+    value = palette.encode(("base16", "base00"), "rgb").replace(" ", "")
+    report = [f"chromium.theme -> {value}"]
+    return value + "\n", report
 
 
-def build_gtk_template_context(palette):
-    base16 = palette["base16"]
-    return build_gtk_ui_colors(base16)
+GTK_RULES = define_color_rules(GTK_UI_SLOTS)
 
 
-def update_gtk_template(contents, palette, template_path):
-    if not os.path.exists(template_path):
-        return contents, [f"missing template: {template_path}"]
+def update_gtk_css(contents, palette):
+    return update_define_colors(contents, palette, GTK_RULES, GTK_UI_SLOTS)
 
-    with open(template_path, "r", encoding="utf-8") as f:
-        template_text = f.read()
 
-    context = build_gtk_template_context(palette)
-    rendered, missing = render_template(template_text, context)
+def build_template_context(palette):
+    # Every template slot: base00-base0F (plus base08_hex "rrggbb" and
+    # base08_rgb "r, g, b" forms), color0-color15, the GTK colour names and
+    # accent/cursor.
+    base16 = palette["base16"]
+    context = dict(base16)
+    context.update(zip((f"{key}_hex" for key in BASE16_KEYS), palette.encoded("bare")))
+    context.update(zip((f"{key}_rgb" for key in BASE16_KEYS), palette.encoded("rgb")))
+    for index, value in palette["ansi"].items():
+        context[f"color{index}"] = value
+    context.update(build_gtk_ui_colors(base16))
+    context.update(palette["ui"])
+    return context
+
+
+def update_from_template(contents, palette, template_path, cache_dir=None):
+    # Renders the whole file from its template; contents is ignored.
+    template = load_template(template_path, cache_dir)
+    if template is None:
+        return contents, [Missing(f"template: {template_path}", ["template"])]
+
+    context = build_template_context(palette)
+    rendered, missing = fill_template(template, context)
     report = [f"template -> {os.path.basename(template_path)}"]
     if missing:
-        report.append("missing keys: " + ", ".join(sorted(missing)))
+        report.append(Missing("keys: " + ", ".join(sorted(missing)), sorted(missing)))
     return rendered, report
 
 
@@ -1123,384 +1419,2001 @@ def update_aether_override(contents, palette):
     return update_gtk_css(contents, palette)
 
 
-def update_steam(contents, palette):
-    base16 = palette["base16"]
-    targets = {
-        "--adw-accent-bg-rgb": base16["base0D"],
-        "--adw-accent-fg-rgb": base16["base00"],
-        "--adw-accent-rgb": base16["base0D"],
-        "--adw-destructive-bg-rgb": base16["base08"],
-        "--adw-destructive-fg-rgb": base16["base07"],
-        "--adw-destructive-rgb": base16["base08"],
-        "--adw-success-bg-rgb": base16["base0B"],
-        "--adw-success-fg-rgb": base16["base00"],
-        "--adw-success-rgb": base16["base0B"],
-        "--adw-warning-bg-rgb": base16["base0A"],
-        "--adw-warning-fg-rgb": base16["base00"],
-        "--adw-warning-rgb": base16["base0A"],
-        "--adw-error-bg-rgb": base16["base08"],
-        "--adw-error-fg-rgb": base16["base00"],
-        "--adw-error-rgb": base16["base08"],
-        "--adw-window-bg-rgb": base16["base00"],
-        "--adw-window-fg-rgb": base16["base05"],
-        "--adw-view-bg-rgb": base16["base00"],
-        "--adw-view-fg-rgb": base16["base05"],
-        "--adw-headerbar-bg-rgb": base16["base00"],
-        "--adw-headerbar-fg-rgb": base16["base05"],
-        "--adw-headerbar-border-rgb": base16["base02"],
-        "--adw-headerbar-backdrop-rgb": base16["base00"],
-        "--adw-sidebar-bg-rgb": base16["base00"],
-        "--adw-sidebar-fg-rgb": base16["base05"],
-        "--adw-sidebar-backdrop-rgb": base16["base01"],
-        "--adw-secondary-sidebar-bg-rgb": base16["base00"],
-        "--adw-secondary-sidebar-fg-rgb": base16["base05"],
-        "--adw-secondary-sidebar-backdrop-rgb": base16["base01"],
-        "--adw-card-bg-rgb": base16["base00"],
-        "--adw-card-fg-rgb": base16["base05"],
-        "--adw-dialog-bg-rgb": base16["base00"],
-        "--adw-dialog-fg-rgb": base16["base05"],
-        "--adw-popover-bg-rgb": base16["base00"],
-        "--adw-popover-fg-rgb": base16["base05"],
-        "--adw-thumbnail-bg-rgb": base16["base00"],
-    }
-    replaced = set()
-    report = []
-    lines = contents.splitlines(keepends=True)
-    new_lines = []
+STEAM_SLOTS = {
+    "--adw-accent-bg-rgb": ("base16", "base0D"),
+    "--adw-accent-fg-rgb": ("base16", "base00"),
+    "--adw-accent-rgb": ("base16", "base0D"),
+    "--adw-destructive-bg-rgb": ("base16", "base08"),
+    "--adw-destructive-fg-rgb": ("base16", "base07"),
+    "--adw-destructive-rgb": ("base16", "base08"),
+    "--adw-success-bg-rgb": ("base16", "base0B"),
+    "--adw-success-fg-rgb": ("base16", "base00"),
+    "--adw-success-rgb": ("base16", "base0B"),
+    "--adw-warning-bg-rgb": ("base16", "base0A"),
+    "--adw-warning-fg-rgb": ("base16", "base00"),
+    "--adw-warning-rgb": ("base16", "base0A"),
+    "--adw-error-bg-rgb": ("base16", "base08"),
+    "--adw-error-fg-rgb": ("base16", "base00"),
+    "--adw-error-rgb": ("base16", "base08"),
+    "--adw-window-bg-rgb": ("base16", "base00"),
+    "--adw-window-fg-rgb": ("base16", "base05"),
+    "--adw-view-bg-rgb": ("base16", "base00"),
+    "--adw-view-fg-rgb": ("base16", "base05"),
+    "--adw-headerbar-bg-rgb": ("base16", "base00"),
+    "--adw-headerbar-fg-rgb": ("base16", "base05"),
+    "--adw-headerbar-border-rgb": ("base16", "base02"),
+    "--adw-headerbar-backdrop-rgb": ("base16", "base00"),
+    "--adw-sidebar-bg-rgb": ("base16", "base00"),
+    "--adw-sidebar-fg-rgb": ("base16", "base05"),
+    "--adw-sidebar-backdrop-rgb": ("base16", "base01"),
+    "--adw-secondary-sidebar-bg-rgb": ("base16", "base00"),
+    "--adw-secondary-sidebar-fg-rgb": ("base16", "base05"),
+    "--adw-secondary-sidebar-backdrop-rgb": ("base16", "base01"),
+    "--adw-card-bg-rgb": ("base16", "base00"),
+    "--adw-card-fg-rgb": ("base16", "base05"),
+    "--adw-dialog-bg-rgb": ("base16", "base00"),
+    "--adw-dialog-fg-rgb": ("base16", "base05"),
+    "--adw-popover-bg-rgb": ("base16", "base00"),
+    "--adw-popover-fg-rgb": ("base16", "base05"),
+    "--adw-thumbnail-bg-rgb": ("base16", "base00"),
+}
 
-    for line in lines:
-        matched = False
-        for name, hex_color in targets.items():
-            if re.match(rf"^\s*{re.escape(name)}\s*:", line):
-                rgb = hex_to_rgb(hex_color)
-                if not rgb:
-                    new_lines.append(line)
-                    matched = True
-                    break
-                r, g, b = rgb
-                new_line, count = re.subn(
-                    rf"^(\s*{re.escape(name)}\s*:\s*)\d+\s*,\s*\d+\s*,\s*\d+",
-                    lambda m: f"{m.group(1)}{r}, {g}, {b}",
-                    line,
-                )
-                if count:
-                    replaced.add(name)
-                    report.append(f"{name} -> {hex_color} ({r}, {g}, {b})")
-                new_lines.append(new_line)
-                matched = True
-                break
-        if matched:
-            continue
-        new_lines.append(line)
 
-    missing = [name for name in targets.keys() if name not in replaced]
-    if missing:
-        report.append("missing keys: " + ", ".join(missing))
+STEAM_RULES = [
+    line_rule(
+        r"^\s*(?P<key>--[A-Za-z0-9_-]+)\s*:\s*(?P<value>\d+\s*,\s*\d+\s*,\s*\d+)",
+        STEAM_SLOTS,
+        report="{label} -> {value} ({text})",
+        encoding="rgb",
+    ),
+]
 
-    return "".join(new_lines), report
 
+def update_steam(contents, palette):
+    updated, report, replaced = rewrite_lines(contents, STEAM_RULES, palette)
+    return updated, finish_slots(STEAM_SLOTS, report, replaced, palette)
+
+
+ZED_STYLE_SLOTS = {
+    "border": ("base16", "base01"),
+    "border.variant": ("base16", "base01"),
+    "elevated_surface.background": ("base16", "base00"),
+    "surface.background": ("base16", "base00"),
+    "background": ("base16", "base00"),
+    "element.background": ("base16", "base01"),
+    "element.hover": ("base16", "base02"),
+    "element.selected": ("base16", "base02"),
+    "drop_target.background": ("base16", "base02"),
+    "ghost_element.hover": ("base16", "base01"),
+    "ghost_element.selected": ("base16", "base02"),
+    "text": ("base16", "base05"),
+    "text.muted": ("base16", "base04"),
+    "text.placeholder": ("base16", "base04"),
+    "text.disabled": ("base16", "base03"),
+    "text.accent": ("base16", "base0D"),
+    "status_bar.background": ("base16", "base00"),
+    "title_bar.background": ("base16", "base00"),
+    "title_bar.inactive_background": ("base16", "base01"),
+    "toolbar.background": ("base16", "base00"),
+    "tab_bar.background": ("base16", "base00"),
+    "tab.inactive_background": ("base16", "base01"),
+    "tab.active_background": ("base16", "base00"),
+    "search.match_background": ("base16", "base02"),
+    "panel.background": ("base16", "base00"),
+    "panel.focused_border": ("base16", "base0D"),
+    "scrollbar.thumb.background": ("base16", "base02"),
+    "scrollbar.thumb.hover_background": ("base16", "base03"),
+    "scrollbar.track.background": ("base16", "base00"),
+    "editor.foreground": ("base16", "base05"),
+    "editor.background": ("base16", "base00"),
+    "editor.gutter.background": ("base16", "base00"),
+    "editor.subheader.background": ("base16", "base00"),
+    "editor.active_line.background": ("base16", "base01"),
+    "editor.line_number": ("base16", "base03"),
+    "editor.active_line_number": ("base16", "base05"),
+    "editor.wrap_guide": ("base16", "base02"),
+    "editor.active_wrap_guide": ("base16", "base02"),
+    "editor.document_highlight.read_background": ("base16", "base01"),
+    "editor.document_highlight.write_background": ("base16", "base01"),
+    "terminal.background": ("base16", "base00"),
+    "terminal.foreground": ("base16", "base05"),
+    "terminal.bright_foreground": ("base16", "base07"),
+    "terminal.dim_foreground": ("base16", "base04"),
+    "link_text.hover": ("base16", "base0C"),
+    "conflict": ("base16", "base0A"),
+    "conflict.background": ("base16", "base00"),
+    "conflict.border": ("base16", "base0A"),
+    "created": ("base16", "base0B"),
+    "created.background": ("base16", "base00"),
+    "created.border": ("base16", "base0B"),
+    "deleted": ("base16", "base08"),
+    "deleted.background": ("base16", "base00"),
+    "deleted.border": ("base16", "base08"),
+    "error": ("base16", "base08"),
+    "error.background": ("base16", "base00"),
+    "error.border": ("base16", "base08"),
+    "hidden": ("base16", "base03"),
+    "hidden.background": ("base16", "base00"),
+    "hidden.border": ("base16", "base03"),
+    "hint": ("base16", "base0C"),
+    "hint.background": ("base16", "base00"),
+    "hint.border": ("base16", "base0C"),
+    "ignored": ("base16", "base03"),
+    "ignored.background": ("base16", "base00"),
+    "ignored.border": ("base16", "base03"),
+    "info": ("base16", "base0C"),
+    "info.background": ("base16", "base00"),
+    "info.border": ("base16", "base0C"),
+    "modified": ("base16", "base0D"),
+    "modified.background": ("base16", "base00"),
+    "modified.border": ("base16", "base0D"),
+    "predictive": ("base16", "base03"),
+    "predictive.background": ("base16", "base01"),
+    "predictive.border": ("base16", "base01"),
+    "renamed": ("base16", "base09"),
+    "renamed.background": ("base16", "base00"),
+    "renamed.border": ("base16", "base09"),
+    "success": ("base16", "base0B"),
+    "success.background": ("base16", "base00"),
+    "success.border": ("base16", "base0B"),
+    "unreachable": ("base16", "base09"),
+    "unreachable.background": ("base16", "base00"),
+    "unreachable.border": ("base16", "base09"),
+    "warning": ("base16", "base09"),
+    "warning.background": ("base16", "base00"),
+    "warning.border": ("base16", "base09"),
+}
+
+ZED_TERMINAL_SLOTS = {
+    "terminal.ansi.black": ("ansi", 0),
+    "terminal.ansi.red": ("ansi", 1),
+    "terminal.ansi.green": ("ansi", 2),
+    "terminal.ansi.yellow": ("ansi", 3),
+    "terminal.ansi.blue": ("ansi", 4),
+    "terminal.ansi.magenta": ("ansi", 5),
+    "terminal.ansi.cyan": ("ansi", 6),
+    "terminal.ansi.white": ("ansi", 7),
+    "terminal.ansi.bright_black": ("ansi", 8),
+    "terminal.ansi.bright_red": ("ansi", 9),
+    "terminal.ansi.bright_green": ("ansi", 10),
+    "terminal.ansi.bright_yellow": ("ansi", 11),
+    "terminal.ansi.bright_blue": ("ansi", 12),
+    "terminal.ansi.bright_magenta": ("ansi", 13),
+    "terminal.ansi.bright_cyan": ("ansi", 14),
+    "terminal.ansi.bright_white": ("ansi", 15),
+}
+
+ZED_PLAYER_SLOTS = [("cursor", "base05"), ("selection", "base02")]
+
+ZED_SYNTAX_SLOTS = {
+    "attribute": ("base16", "base0D"),
+    "boolean": ("base16", "base09"),
+    "comment": ("base16", "base03"),
+    "comment.doc": ("base16", "base03"),
+    "constant": ("base16", "base09"),
+    "constructor": ("base16", "base0D"),
+    "emphasis": ("base16", "base0D"),
+    "emphasis.strong": ("base16", "base08"),
+    "function": ("base16", "base0D"),
+    "keyword": ("base16", "base0E"),
+    "label": ("base16", "base0A"),
+    "link_text": ("base16", "base0D"),
+    "link_uri": ("base16", "base0D"),
+    "number": ("base16", "base09"),
+    "punctuation": ("base16", "base05"),
+    "punctuation.bracket": ("base16", "base05"),
+    "punctuation.delimiter": ("base16", "base05"),
+    "punctuation.list_marker": ("base16", "base05"),
+    "punctuation.special": ("base16", "base05"),
+    "string": ("base16", "base0B"),
+    "string.escape": ("base16", "base0C"),
+    "string.regex": ("base16", "base0C"),
+    "string.special": ("base16", "base0C"),
+    "string.special.symbol": ("base16", "base0C"),
+    "tag": ("base16", "base0A"),
+    "text.literal": ("base16", "base0B"),
+    "title": ("base16", "base0D"),
+    "type": ("base16", "base0A"),
+    "variable": ("base16", "base08"),
+    "variable.special": ("base16", "base08"),
+}
+
+# Only the containers named here are walked; every other value is kept as its
+# (start, end) span in the original text, so update_aether_zed can splice new
+# colours in and leave formatting, key order and escapes exactly as they were.
+ZED_SHAPE = {
+    "themes": [
+        {"style": {"players": [{}], "syntax": {key: {} for key in ZED_SYNTAX_SLOTS}}},
+    ],
+}
 
-def update_aether_zed(contents, palette):
+JSON_STRING = r'"([^"\\\x00-\x1f]*(?:\\.[^"\\\x00-\x1f]*)*)"'
+# A member key, plus (the common case, matched in the same call) a string value
+# and the delimiter after it.
+JSON_MEMBER_RE = lazy_re(
+    rf"{JSON_STRING}[ \t\n\r]*:[ \t\n\r]*(?:({JSON_STRING})[ \t\n\r]*([,}}])[ \t\n\r]*)?"
+)
+JSON_DELIMITER_RE = lazy_re(r"[ \t\n\r]*([,}\]])[ \t\n\r]*")
+
+
+def scan_json(text, shape):
+    """Return the span tree of the JSON document text.
+
+    A dict shape descends into an object (its keys give the shapes of those
+    members) and a one-item list shape into an array, giving a dict or list of
+    the children's nodes. Any other value is checked and skipped by the C
+    scanner, and its node is its (start, end) span. Malformed JSON raises
+    json.JSONDecodeError.
+    """
+    import json
+
+    decoder = json.JSONDecoder()
+    scanstring = json.decoder.scanstring
+    skip = JSON_WS_RE.match
+    member = JSON_MEMBER_RE.match
+    delimiter = JSON_DELIMITER_RE.match
+
+    def fail(message, pos):
+        raise json.JSONDecodeError(message, text, pos)
+
+    def value(pos, shape):
+        char = text[pos:pos + 1]
+        if char == "{" and isinstance(shape, dict):
+            return members(skip(text, pos + 1).end(), shape)
+        if char == "[" and isinstance(shape, list):
+            return items(skip(text, pos + 1).end(), shape[0])
+        end = decoder.raw_decode(text, pos)[1]
+        return (pos, end), end
+
+    def members(pos, shape):
+        node = {}
+        if text[pos:pos + 1] == "}":
+            return node, pos + 1
+        while True:
+            match = member(text, pos)
+            if match is None:
+                if text[pos:pos + 1] != '"':
+                    fail("Expecting property name enclosed in double quotes", pos)
+                # Raises for a malformed key, else the ':' is what is missing.
+                pos = scanstring(text, pos + 1)[1]
+                fail("Expecting ':' delimiter", skip(text, pos).end())
+            key, string, _, close = match.groups()
+            if "\\" in key:
+                key = scanstring(text, pos + 1)[0]
+            if string is not None:
+                start, end = match.span(2)
+                if "\\" in string:
+                    scanstring(text, start + 1)
+                node[key] = (start, end)
+                if close == "}":
+                    return node, match.end()
+                pos = match.end()
+                continue
+            node[key], pos = value(match.end(), shape.get(key))
+            match = delimiter(text, pos)
+            if match is None or match.group(1) == "]":
+                fail("Expecting ',' delimiter", skip(text, pos).end())
+            if match.group(1) == "}":
+                return node, match.end()
+            pos = match.end()
+
+    def items(pos, shape):
+        node = []
+        if text[pos:pos + 1] == "]":
+            return node, pos + 1
+        while True:
+            child, pos = value(pos, shape)
+            node.append(child)
+            match = delimiter(text, pos)
+            if match is None or match.group(1) == "}":
+                fail("Expecting ',' delimiter", skip(text, pos).end())
+            if match.group(1) == "]":
+                return node, match.end()
+            pos = match.end()
+
+    node, end = value(skip(text, 0).end(), shape)
+    if skip(text, end).end() != len(text):
+        fail("Extra data", end)
+    return node
+
+
+def json_member(node, key, kind=dict):
+    child = node.get(key) if isinstance(node, dict) else None
+    return child if isinstance(child, kind) else kind()
+
+
+def splice_spans(text, edits):
+    # edits are ((start, end), replacement) pairs with non-overlapping spans.
+    pieces = []
+    position = 0
+    for (start, end), replacement in sorted(edits):
+        pieces.append(text[position:start])
+        pieces.append(replacement)
+        position = end
+    pieces.append(text[position:])
+    return "".join(pieces)
+
+
+def build_zed_updates(palette):
+    # The Zed slot tables resolved against one palette: (key, value, JSON
+    # literal) triples for style and syntax, and the players' colours. Kept
+    # on the palette (Palette.derived), so every apply after the first reuses
+    # them.
     base16 = palette["base16"]
-    ansi = palette["ansi"]
-    data = json.loads(contents)
-    report = []
+    style = [(key, palette[group][name]) for key, (group, name) in ZED_STYLE_SLOTS.items()]
+    style.append(("scrollbar.thumb.border", f"{base16['base03']}6f"))
+    style.extend((key, palette[group][index]) for key, (group, index) in ZED_TERMINAL_SLOTS.items())
+    syntax = [(key, palette[group][name]) for key, (group, name) in ZED_SYNTAX_SLOTS.items()]
+    return (
+        [(key, value, f'"{value}"') for key, value in style],
+        {name: (base16[slot], f'"{base16[slot]}"') for name, slot in ZED_PLAYER_SLOTS},
+        [(key, value, f'"{value}"') for key, value in syntax],
+    )
 
-    theme = data.get("themes", [{}])[0]
-    style = theme.get("style", {})
-
-    style_updates = {
-        "border": base16["base01"],
-        "border.variant": base16["base01"],
-        "elevated_surface.background": base16["base00"],
-        "surface.background": base16["base00"],
-        "background": base16["base00"],
-        "element.background": base16["base01"],
-        "element.hover": base16["base02"],
-        "element.selected": base16["base02"],
-        "drop_target.background": base16["base02"],
-        "ghost_element.hover": base16["base01"],
-        "ghost_element.selected": base16["base02"],
-        "text": base16["base05"],
-        "text.muted": base16["base04"],
-        "text.placeholder": base16["base04"],
-        "text.disabled": base16["base03"],
-        "text.accent": base16["base0D"],
-        "status_bar.background": base16["base00"],
-        "title_bar.background": base16["base00"],
-        "title_bar.inactive_background": base16["base01"],
-        "toolbar.background": base16["base00"],
-        "tab_bar.background": base16["base00"],
-        "tab.inactive_background": base16["base01"],
-        "tab.active_background": base16["base00"],
-        "search.match_background": base16["base02"],
-        "panel.background": base16["base00"],
-        "panel.focused_border": base16["base0D"],
-        "scrollbar.thumb.background": base16["base02"],
-        "scrollbar.thumb.hover_background": base16["base03"],
-        "scrollbar.track.background": base16["base00"],
-        "editor.foreground": base16["base05"],
-        "editor.background": base16["base00"],
-        "editor.gutter.background": base16["base00"],
-        "editor.subheader.background": base16["base00"],
-        "editor.active_line.background": base16["base01"],
-        "editor.line_number": base16["base03"],
-        "editor.active_line_number": base16["base05"],
-        "editor.wrap_guide": base16["base02"],
-        "editor.active_wrap_guide": base16["base02"],
-        "editor.document_highlight.read_background": base16["base01"],
-        "editor.document_highlight.write_background": base16["base01"],
-        "terminal.background": base16["base00"],
-        "terminal.foreground": base16["base05"],
-        "terminal.bright_foreground": base16["base07"],
-        "terminal.dim_foreground": base16["base04"],
-        "link_text.hover": base16["base0C"],
-        "conflict": base16["base0A"],
-        "conflict.background": base16["base00"],
-        "conflict.border": base16["base0A"],
-        "created": base16["base0B"],
-        "created.background": base16["base00"],
-        "created.border": base16["base0B"],
-        "deleted": base16["base08"],
-        "deleted.background": base16["base00"],
-        "deleted.border": base16["base08"],
-        "error": base16["base08"],
-        "error.background": base16["base00"],
-        "error.border": base16["base08"],
-        "hidden": base16["base03"],
-        "hidden.background": base16["base00"],
-        "hidden.border": base16["base03"],
-        "hint": base16["base0C"],
-        "hint.background": base16["base00"],
-        "hint.border": base16["base0C"],
-        "ignored": base16["base03"],
-        "ignored.background": base16["base00"],
-        "ignored.border": base16["base03"],
-        "info": base16["base0C"],
-        "info.background": base16["base00"],
-        "info.border": base16["base0C"],
-        "modified": base16["base0D"],
-        "modified.background": base16["base00"],
-        "modified.border": base16["base0D"],
-        "predictive": base16["base03"],
-        "predictive.background": base16["base01"],
-        "predictive.border": base16["base01"],
-        "renamed": base16["base09"],
-        "renamed.background": base16["base00"],
-        "renamed.border": base16["base09"],
-        "success": base16["base0B"],
-        "success.background": base16["base00"],
-        "success.border": base16["base0B"],
-        "unreachable": base16["base09"],
-        "unreachable.background": base16["base00"],
-        "unreachable.border": base16["base09"],
-        "warning": base16["base09"],
-        "warning.background": base16["base00"],
-        "warning.border": base16["base09"],
-    }
 
-    for key, value in style_updates.items():
-        if key in style:
-            style[key] = value
-            report.append(f"style.{key} -> {value}")
-        else:
-            report.append(f"missing style.{key}")
+def update_zed_theme(style, updates, label, edits, report):
+    style_updates, player_updates, syntax_updates = updates
 
-    if "scrollbar.thumb.border" in style:
-        style["scrollbar.thumb.border"] = f"{base16['base03']}6f"
-        report.append(f"style.scrollbar.thumb.border -> {base16['base03']}6f")
-    else:
-        report.append("missing style.scrollbar.thumb.border")
-
-    terminal_map = {
-        "terminal.ansi.black": ansi[0],
-        "terminal.ansi.red": ansi[1],
-        "terminal.ansi.green": ansi[2],
-        "terminal.ansi.yellow": ansi[3],
-        "terminal.ansi.blue": ansi[4],
-        "terminal.ansi.magenta": ansi[5],
-        "terminal.ansi.cyan": ansi[6],
-        "terminal.ansi.white": ansi[7],
-        "terminal.ansi.bright_black": ansi[8],
-        "terminal.ansi.bright_red": ansi[9],
-        "terminal.ansi.bright_green": ansi[10],
-        "terminal.ansi.bright_yellow": ansi[11],
-        "terminal.ansi.bright_blue": ansi[12],
-        "terminal.ansi.bright_magenta": ansi[13],
-        "terminal.ansi.bright_cyan": ansi[14],
-        "terminal.ansi.bright_white": ansi[15],
-    }
-    for key, value in terminal_map.items():
+    for key, value, literal in style_updates:
         if key in style:
-            style[key] = value
-            report.append(f"style.{key} -> {value}")
+            edits.append((style[key], literal))
+            report.append(f"{label}style.{key} -> {value}")
         else:
-            report.append(f"missing style.{key}")
+            missing = f"{label}style.{key}"
+            report.append(Missing(missing, [missing]))
 
-    players = style.get("players", [])
+    players = json_member(style, "players", list)
     for idx, player in enumerate(players):
-        if "cursor" in player:
-            player["cursor"] = base16["base05"]
-            report.append(f"players[{idx}].cursor -> {base16['base05']}")
+        for name, (value, literal) in player_updates.items():
+            if isinstance(player, dict) and name in player:
+                edits.append((player[name], literal))
+                report.append(f"{label}players[{idx}].{name} -> {value}")
+            else:
+                missing = f"{label}players[{idx}].{name}"
+                report.append(Missing(missing, [missing]))
+
+    syntax = json_member(style, "syntax")
+    for key, value, literal in syntax_updates:
+        entry = syntax.get(key)
+        if isinstance(entry, dict) and "color" in entry:
+            edits.append((entry["color"], literal))
+            report.append(f"{label}syntax.{key} -> {value}")
         else:
-            report.append(f"missing players[{idx}].cursor")
-        if "selection" in player:
-            player["selection"] = base16["base02"]
-            report.append(f"players[{idx}].selection -> {base16['base02']}")
+            missing = f"{label}syntax.{key}"
+            report.append(Missing(missing, [missing]))
+
+
+def update_aether_zed(contents, palette, appearances=None):
+    """Update every theme entry of a Zed theme pack.
+
+    appearances optionally maps an entry's "appearance" ("light", "dark") to
+    the palette used for it instead of palette. Report entries are prefixed
+    with themes[N]. when the pack holds more than one theme.
+    """
+    document = cached_plan(("zed", contents), lambda: scan_json(contents, ZED_SHAPE))
+    report = []
+    edits = []
+
+    themes = json_member(document, "themes", list)
+    for index, theme in enumerate(themes or [{}]):
+        theme_palette = palette
+        if appearances and isinstance(theme, dict) and "appearance" in theme:
+            start, end = theme["appearance"]
+            theme_palette = appearances.get(contents[start + 1:end - 1], palette)
+        updates = theme_palette.derived("zed", build_zed_updates)
+        label = f"themes[{index}]." if len(themes) > 1 else ""
+        update_zed_theme(json_member(theme, "style"), updates, label, edits, report)
+
+    return splice_spans(contents, edits), report
+
+
+# Writes go to a sibling temp file that is renamed over the target, so readers
+# never see a truncated file. sync="file" fsyncs the data and the directory
+# for every write; sync="dir" fsyncs the data and leaves the directory fsync to
+# sync_directories(), called once per directory after a batch.
+def write_file(path, data, sync=None):
+    with atomic_writer(path, binary=isinstance(data, bytes), sync=sync) as f:
+        f.write(data)
+        return f.tell()
+
+
+@contextmanager
+def atomic_writer(path, binary=False, sync=None):
+    # Yields a file whose contents replace `path` when the block exits
+    # normally; if the block raises, the temp file is removed and the
+    # target is left untouched.
+    target = os.path.realpath(path)
+    directory = os.path.dirname(target)
+    try:
+        current = os.stat(target)
+    except FileNotFoundError:
+        current = None
+
+    tmp_path = os.path.join(
+        directory,
+        f".{os.path.basename(target)}.{os.getpid()}-{threading.get_ident()}.tmp",
+    )
+    fd = os.open(tmp_path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o666)
+    try:
+        if binary:
+            f = open(fd, "wb")
         else:
-            report.append(f"missing players[{idx}].selection")
-
-    syntax = style.get("syntax", {})
-    syntax_updates = {
-        "attribute": base16["base0D"],
-        "boolean": base16["base09"],
-        "comment": base16["base03"],
-        "comment.doc": base16["base03"],
-        "constant": base16["base09"],
-        "constructor": base16["base0D"],
-        "emphasis": base16["base0D"],
-        "emphasis.strong": base16["base08"],
-        "function": base16["base0D"],
-        "keyword": base16["base0E"],
-        "label": base16["base0A"],
-        "link_text": base16["base0D"],
-        "link_uri": base16["base0D"],
-        "number": base16["base09"],
-        "punctuation": base16["base05"],
-        "punctuation.bracket": base16["base05"],
-        "punctuation.delimiter": base16["base05"],
-        "punctuation.list_marker": base16["base05"],
-        "punctuation.special": base16["base05"],
-        "string": base16["base0B"],
-        "string.escape": base16["base0C"],
-        "string.regex": base16["base0C"],
-        "string.special": base16["base0C"],
-        "string.special.symbol": base16["base0C"],
-        "tag": base16["base0A"],
-        "text.literal": base16["base0B"],
-        "title": base16["base0D"],
-        "type": base16["base0A"],
-        "variable": base16["base08"],
-        "variable.special": base16["base08"],
+            f = open(fd, "w", encoding="utf-8")
+        with f:
+            yield f
+            if sync:
+                f.flush()
+                os.fsync(f.fileno())
+        if current is not None:
+            os.chmod(tmp_path, stat.S_IMODE(current.st_mode))
+            preserve_owner(tmp_path, current)
+        os.replace(tmp_path, target)
+    except BaseException:
+        try:
+            os.unlink(tmp_path)
+        except OSError:
+            pass
+        raise
+
+    if sync == "file":
+        sync_directories([directory])
+
+
+def preserve_owner(path, info):
+    if not hasattr(os, "chown"):
+        return
+    created = os.stat(path)
+    if (created.st_uid, created.st_gid) == (info.st_uid, info.st_gid):
+        return
+    try:
+        os.chown(path, info.st_uid, info.st_gid)
+    except PermissionError:
+        pass
+
+
+def sync_directories(directories):
+    if not hasattr(os, "O_DIRECTORY"):
+        return
+    for directory in sorted(set(directories)):
+        fd = os.open(directory, os.O_RDONLY | os.O_DIRECTORY)
+        try:
+            os.fsync(fd)
+        finally:
+            os.close(fd)
+
+
+def output_directories(paths):
+    return [os.path.dirname(os.path.realpath(path)) for path in paths]
+
+
+@contextmanager
+def recording_timings():
+    """Collect the stages timed by the enclosed code into a dict of name -> ns.
+
+    Stages nest freely and repeat stages accumulate. Only the current thread
+    is recorded; worker jobs report their own timings (see timed_call).
+    """
+    previous = getattr(TIMINGS, "stages", None)
+    stages = TIMINGS.stages = {}
+    try:
+        yield stages
+    finally:
+        TIMINGS.stages = previous
+
+
+@contextmanager
+def timed(stage):
+    stages = getattr(TIMINGS, "stages", None)
+    if stages is None:
+        yield
+        return
+    start = time.perf_counter_ns()
+    try:
+        yield
+    finally:
+        stages[stage] = stages.get(stage, 0) + time.perf_counter_ns() - start
+
+
+def timed_call(fn, *args):
+    with recording_timings() as stages:
+        with timed("total"):
+            result = fn(*args)
+    return result, stages
+
+
+# One applied file: its report entries and the number of bytes written (0 when
+# the file was left untouched).
+FileReport = namedtuple("FileReport", ["path", "report", "written"])
+
+
+def apply_file(path, update_fn, palette, sync=None):
+    if update_fn in BUFFER_UPDATERS and os.path.getsize(path) >= MMAP_MIN_BYTES:
+        result = splice_file(path, update_fn, palette, sync)
+        if result is not None:
+            return result
+
+    with open_source(path, update_fn) as f:
+        if update_fn in STREAMING_UPDATERS and os.fstat(f.fileno()).st_size >= STREAM_MIN_BYTES:
+            return stream_file(f, path, update_fn, palette, sync)
+        with timed("read"):
+            original = f.read()
+
+    with timed("update"):
+        updated, report = update_fn(original, palette)
+
+    written = 0
+    if updated != original:
+        with timed("write"):
+            written = write_file(path, updated, sync=sync)
+
+    return report, written
+
+
+def template_path_of(update_fn):
+    keywords = getattr(update_fn, "keywords", None) or {}
+    return keywords.get("template_path")
+
+
+def open_source(path, update_fn):
+    # Files rendered from a template need not exist yet; they read as empty.
+    try:
+        return open(path, "r", encoding="utf-8")
+    except FileNotFoundError:
+        if template_path_of(update_fn) is None:
+            raise
+        return io.StringIO()
+
+
+class Unchanged(Exception):
+    pass
+
+
+def stream_file(src, path, update_fn, palette, sync=None):
+    # Rewrites line by line from src straight into the replacement file. The
+    # replacement is only committed if some value actually changed.
+    try:
+        with timed("update"):
+            with atomic_writer(path, sync=sync) as out:
+                report, changed = stream_update(update_fn, src, out, palette)
+                if not changed:
+                    raise Unchanged()
+                written = out.tell()
+    except Unchanged:
+        return report, 0
+    return report, written
+
+
+def splice_file(path, update_fn, palette, sync=None):
+    # The mmap path for BUFFER_UPDATERS. Returns None (use the text path) when
+    # the file has CR line endings, which the text path normalises, or other
+    # line breaks that str.splitlines() honours but the bytes rules do not.
+    import mmap
+
+    with open(path, "rb") as f:
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as buffer:
+            if LINE_BREAK_BYTES_RE.search(buffer) is not None:
+                return None
+            try:
+                with timed("update"):
+                    with atomic_writer(path, binary=True, sync=sync) as out:
+                        report, changed = splice_update(update_fn, buffer, out, palette)
+                        if not changed:
+                            raise Unchanged()
+                        written = out.tell()
+            except Unchanged:
+                return report, 0
+    return report, written
+
+
+def preview_file(path, update_fn, palette):
+    # Like apply_file, but reports the bytes it would write instead of writing.
+    with timed("read"):
+        with open_source(path, update_fn) as f:
+            original = f.read()
+
+    with timed("update"):
+        updated, report = update_fn(original, palette)
+
+    if updated == original:
+        return report, 0
+    return report, len(updated.encode("utf-8"))
+
+
+def diff_file(path, update_fn, palette, out):
+    with timed("read"):
+        with open_source(path, update_fn) as f:
+            original = f.read()
+            created = isinstance(f, io.StringIO)
+
+    with timed("update"):
+        updated, report = update_fn(original, palette)
+
+    if updated == original:
+        return report, 0
+    with timed("diff"):
+        out.writelines(diff_lines(original, updated, os.path.relpath(path), created))
+    return report, len(updated.encode("utf-8"))
+
+
+def diff_lines(original, updated, name, created=False):
+    import difflib
+
+    lines = difflib.unified_diff(
+        original.splitlines(keepends=True),
+        updated.splitlines(keepends=True),
+        "/dev/null" if created else f"a/{name}",
+        f"b/{name}",
+    )
+    for line in lines:
+        if line.endswith("\n"):
+            yield line
+        else:
+            yield line + "\n\\ No newline at end of file\n"
+
+
+def content_hash(text):
+    import hashlib
+
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+def scheme_hash(palette):
+    import json
+
+    return content_hash(json.dumps(palette["base16"], sort_keys=True))
+
+
+def load_manifest(path):
+    import json
+
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            data = json.load(f)
+    except FileNotFoundError:
+        return {}
+    except ValueError:
+        return {}
+    if not isinstance(data, dict) or data.get("version") != MANIFEST_VERSION:
+        return {}
+    return data.get("files", {})
+
+
+def save_manifest(path, entries, sync=None):
+    import json
+
+    data = {"version": MANIFEST_VERSION, "files": entries}
+    text = json.dumps(data, indent=2, sort_keys=True) + "\n"
+    write_file(path, text, sync="file" if sync else None)
+
+
+# Manifest entries describe the file as this tool last left it. Re-applying the
+# same scheme with the same updater is idempotent, so a file whose size and
+# mtime (or, failing that, content hash) still match can be skipped outright.
+def apply_file_with_manifest(path, update_fn, palette, scheme, entry, sync=None):
+    updater = update_fn.__name__
+    current = entry is not None and entry["scheme"] == scheme and entry["updater"] == updater
+    if current:
+        info = os.stat(path)
+        if info.st_size == entry["size"] and info.st_mtime_ns == entry["mtime_ns"]:
+            return load_report(entry["report"]), 0, entry
+
+    with timed("read"):
+        with open(path, "r", encoding="utf-8") as f:
+            original = f.read()
+    with timed("hash"):
+        digest = content_hash(original)
+
+    if current and digest == entry["sha256"]:
+        updated, report = original, load_report(entry["report"])
+    else:
+        with timed("update"):
+            updated, report = update_fn(original, palette)
+
+    written = 0
+    if updated != original:
+        with timed("write"):
+            written = write_file(path, updated, sync=sync)
+        with timed("hash"):
+            digest = content_hash(updated)
+
+    info = os.stat(path)
+    return report, written, {
+        "size": info.st_size,
+        "mtime_ns": info.st_mtime_ns,
+        "sha256": digest,
+        "scheme": scheme,
+        "updater": updater,
+        "report": dump_report(report),
     }
 
-    for key, value in syntax_updates.items():
-        entry = syntax.get(key)
-        if isinstance(entry, dict) and "color" in entry:
-            entry["color"] = value
-            report.append(f"syntax.{key} -> {value}")
+
+def is_process_bound(path):
+    try:
+        return os.path.getsize(path) >= PROCESS_POOL_MIN_BYTES
+    except OSError:
+        return False
+
+
+def run_parallel(fn, tasks, workers=1):
+    # Each task is an argument tuple for fn whose first item is the file path.
+    if workers <= 1:
+        return [fn(*task) for task in tasks]
+
+    import multiprocessing
+    from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+
+    # The process pool is started while worker threads are running, so it must
+    # not fork this process: use a forkserver where there is one.
+    methods = multiprocessing.get_all_start_methods()
+    context = multiprocessing.get_context("forkserver" if "forkserver" in methods else "spawn")
+    futures = []
+    processes = None
+    try:
+        with ThreadPoolExecutor(max_workers=workers) as threads:
+            for task in tasks:
+                executor = threads
+                if is_process_bound(task[0]):
+                    if processes is None:
+                        processes = ProcessPoolExecutor(max_workers=workers, mp_context=context)
+                    executor = processes
+                futures.append(executor.submit(fn, *task))
+            return [future.result() for future in futures]
+    finally:
+        if processes is not None:
+            processes.shutdown()
+
+
+def apply_manifest_job(path, update_fn, palette, scheme, entry, sync=None):
+    if scheme is None:
+        return apply_file(path, update_fn, palette, sync) + (None,)
+    return apply_file_with_manifest(path, update_fn, palette, scheme, entry, sync)
+
+
+def run_jobs(fn, tasks, workers=1, timings=None):
+    # With a timings list, each job also reports (path, stages) into it.
+    if timings is None:
+        return run_parallel(fn, tasks, workers=workers)
+    results = []
+    for task, (result, stages) in zip(tasks, run_parallel(partial(timed_call, fn), tasks, workers)):
+        timings.append((task[0], stages))
+        results.append(result)
+    return results
+
+
+def apply_files(jobs, palette, workers=1, manifest=None, sync=None, timings=None):
+    if manifest is None:
+        tasks = [(path, update_fn, palette, sync) for path, update_fn in jobs]
+        reports = run_jobs(apply_file, tasks, workers=workers, timings=timings)
+        if sync == "dir":
+            with timed("sync"):
+                sync_directories(output_directories(path for path, _ in jobs))
+        return [FileReport(path, *result) for (path, _), result in zip(jobs, reports)]
+
+    # Updaters bound to extra state (e.g. a template path) are not tracked:
+    # their output depends on more than the scheme and the file itself.
+    scheme = scheme_hash(palette)
+    tasks = []
+    for path, update_fn in jobs:
+        if isinstance(update_fn, FunctionType):
+            entry = manifest.get(os.path.abspath(path))
+            tasks.append((path, update_fn, palette, scheme, entry, sync))
         else:
-            report.append(f"missing syntax.{key}")
+            tasks.append((path, update_fn, palette, None, None, sync))
+
+    results = run_jobs(apply_manifest_job, tasks, workers=workers, timings=timings)
+    if sync == "dir":
+        with timed("sync"):
+            sync_directories(output_directories(path for path, _ in jobs))
+    reports = []
+    for (path, _), (report, written, entry) in zip(jobs, results):
+        if entry is not None:
+            manifest[os.path.abspath(path)] = entry
+        reports.append(FileReport(path, report, written))
+    return reports
+
+
+def read_source(path, update_fn):
+    with open_source(path, update_fn) as f:
+        return f.read()
+
+
+async def apply_file_async(path, update_fn, palette, semaphore, executor=None, sync=None):
+    import asyncio
+
+    loop = asyncio.get_running_loop()
+    async with semaphore:
+        original = await loop.run_in_executor(executor, read_source, path, update_fn)
+        updated, report = update_fn(original, palette)
+        written = 0
+        if updated != original:
+            written = await loop.run_in_executor(executor, write_file, path, updated, sync)
+    return FileReport(path, report, written)
+
+
+async def apply_directory(
+    root, palette, template=None, recursive=False, semaphore=None, executor=None, sync=None
+):
+    """Apply palette to the supported files in root; return their FileReports.
+
+    Directory scans, reads and writes run on executor (the loop's default
+    thread pool if None) so they overlap across files and directories; the
+    updaters themselves run on the event loop. semaphore bounds how many
+    files are in flight and is meant to be shared between directories.
+    """
+    import asyncio
+
+    loop = asyncio.get_running_loop()
+    if semaphore is None:
+        semaphore = asyncio.Semaphore(ASYNC_CONCURRENCY)
+    jobs = await loop.run_in_executor(executor, build_jobs, root, template, recursive)
+    return await asyncio.gather(
+        *(
+            apply_file_async(path, update_fn, palette, semaphore, executor, sync)
+            for path, update_fn in jobs
+        )
+    )
 
-    output = json.dumps(data, indent=2, ensure_ascii=True)
-    if not output.endswith("\n"):
-        output += "\n"
 
-    return output, report
+async def apply_directories(
+    roots, palette, concurrency=None, template=None, recursive=False, sync=None
+):
+    """Apply palette to many theme directories, at most concurrency files at once.
+
+    Returns one list of FileReports per root, in order; a directory that
+    failed gets the exception it raised instead.
+    """
+    import asyncio
+    from concurrent.futures import ThreadPoolExecutor
+
+    concurrency = concurrency or ASYNC_CONCURRENCY
+    semaphore = asyncio.Semaphore(concurrency)
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        return await asyncio.gather(
+            *(
+                apply_directory(root, palette, template, recursive, semaphore, executor, sync)
+                for root in roots
+            ),
+            return_exceptions=True,
+        )
 
 
-def apply_file(path, update_fn, palette):
-    with open(path, "r", encoding="utf-8") as f:
-        original = f.read()
+def preview_files(jobs, palette, workers=1, diff=None, timings=None):
+    # With diff (a text stream), files are processed one at a time in order so
+    # each diff is written as soon as its file is done.
+    tasks = [(path, update_fn, palette) for path, update_fn in jobs]
+    if diff is not None:
+        results = run_jobs(partial(diff_file, out=diff), tasks, timings=timings)
+    else:
+        results = run_jobs(preview_file, tasks, workers=workers, timings=timings)
+    return [FileReport(path, *result) for (path, _), result in zip(jobs, results)]
+
+
+def render_matrix_file(path, update_fn, palettes, out_paths, sync=None):
+    with timed("read"):
+        with open_source(path, update_fn) as f:
+            original = f.read()
+
+    reports = []
+    with cached_plans():
+        for palette, out_path in zip(palettes, out_paths):
+            with timed("update"):
+                updated, report = update_fn(original, palette)
+            with timed("write"):
+                os.makedirs(os.path.dirname(out_path), exist_ok=True)
+                written = write_file(out_path, updated, sync=sync)
+            reports.append((report, written))
+
+    return reports
+
+
+def theme_dir_name(root):
+    return os.path.basename(os.path.normpath(root))
+
+
+def matrix_output_names(paths, name_of=theme_dir_name):
+    """Map each path to the directory name its --matrix output goes under.
+
+    Names are name_of(path), the basename by default; paths sharing a name
+    get a short hash of their absolute path appended so they cannot
+    overwrite each other's output. Used for scheme files and theme
+    directories alike.
+    """
+    counts = {}
+    for path in paths:
+        name = name_of(path)
+        counts[name] = counts.get(name, 0) + 1
+    names = {}
+    for path in paths:
+        name = name_of(path)
+        if counts[name] > 1:
+            abs_path = os.path.abspath(path)
+            name = f"{name}-{zlib.crc32(abs_path.encode('utf-8')):08x}"
+        names[path] = name
+    return names
+
+
+def matrix_output_root(out_dir, scheme_name, dir_name):
+    return os.path.join(out_dir, scheme_name, dir_name)
+
+
+def render_matrix(batches, schemes, out_dir, workers=1, sync=None, timings=None):
+    palettes = [palette for _, palette in schemes]
+    dir_names = matrix_output_names([root for root, _ in batches])
+    tasks = []
+    for root, root_jobs in batches:
+        out_roots = [matrix_output_root(out_dir, name, dir_names[root]) for name, _ in schemes]
+        for path, update_fn in root_jobs:
+            relpath = os.path.relpath(path, root)
+            out_paths = [os.path.join(out_root, relpath) for out_root in out_roots]
+            tasks.append((path, update_fn, palettes, out_paths, sync))
+    results = run_jobs(render_matrix_file, tasks, workers=workers, timings=timings)
+    if sync == "dir":
+        with timed("sync"):
+            sync_directories(output_directories(path for task in tasks for path in task[3]))
+
+    groups = []
+    for index, (name, _) in enumerate(schemes):
+        offset = 0
+        for root, root_jobs in batches:
+            out_root = matrix_output_root(out_dir, name, dir_names[root])
+            entries = [
+                FileReport(tasks[offset + n][3][index], *results[offset + n][index])
+                for n in range(len(root_jobs))
+            ]
+            offset += len(root_jobs)
+            groups.append((out_root, out_root, entries))
+    return groups
+
+
+# Supported files, in processing order. Updaters compile their rules on first
+# use, so formats that are never applied cost nothing beyond this entry.
+FORMATS = [
+    ("ghostty.conf", update_ghostty),
+    ("neovim.lua", update_neovim),
+    ("alacritty.toml", update_alacritty),
+    ("kitty.conf", update_kitty),
+    ("warp.yaml", update_warp),
+    ("colors.fish", update_colors_fish),
+    ("fzf.fish", update_fzf_fish),
+    ("vencord.theme.css", update_vencord),
+    ("hyprland.conf", update_hyprland),
+    ("hyprlock.conf", update_hyprlock),
+    ("mako.ini", update_mako),
+    ("waybar.css", update_waybar),
+    ("wofi.css", update_wofi),
+    ("walker.css", update_walker),
+    ("swayosd.css", update_swayosd),
+    ("btop.theme", update_btop),
+    ("cava_theme", update_cava),
+    ("chromium.theme", update_chromium),
+    ("gtk.css", update_gtk_css),
+    ("aether.override.css", update_aether_override),
+    ("steam.css", update_steam),
+    ("aether.zed.json", update_aether_zed),
+]
+
+# Streaming counterparts of the updaters whose only pass over the text is
+# rewrite_lines(): updater -> (rules, track, finish). stream_update() runs them
+# over an iterable of lines; apply_file streams files of at least
+# STREAM_MIN_BYTES through it.
+STREAMING_UPDATERS = {
+    update_ghostty: (GHOSTTY_RULES, None, finish_ghostty),
+    update_alacritty: (ALACRITTY_RULES, track_toml_section, finish_alacritty),
+    update_kitty: (KITTY_RULES, None, finish_kitty),
+    update_warp: (WARP_RULES, track_warp_section, finish_warp),
+    update_colors_fish: (COLORS_FISH_RULES, None, finish_colors_fish),
+    update_fzf_fish: (FZF_FISH_RULES, None, finish_fzf_fish),
+    update_hyprlock: (HYPRLOCK_RULES, None, partial(finish_slots, HYPRLOCK_SLOTS)),
+    update_mako: (MAKO_RULES, None, partial(finish_slots, MAKO_SLOTS)),
+    update_waybar: (WAYBAR_RULES, None, partial(finish_slots, WAYBAR_SLOTS)),
+    update_wofi: (WOFI_RULES, None, partial(finish_slots, WOFI_SLOTS)),
+    update_walker: (WALKER_RULES, None, partial(finish_slots, WALKER_SLOTS)),
+    update_swayosd: (SWAYOSD_RULES, None, partial(finish_slots, SWAYOSD_SLOTS)),
+    update_btop: (BTOP_RULES, None, partial(finish_slots, BTOP_SLOTS)),
+    update_cava: (CAVA_RULES, None, finish_cava),
+    update_gtk_css: (GTK_RULES, None, partial(finish_slots, GTK_UI_SLOTS)),
+    update_aether_override: (GTK_RULES, None, partial(finish_slots, GTK_UI_SLOTS)),
+    update_steam: (STEAM_RULES, None, partial(finish_slots, STEAM_SLOTS)),
+}
 
-    updated, report = update_fn(original, palette)
+# Bytes counterparts of the CSS custom-property updaters: updater -> (rule,
+# finish), where rule is the updater's str rule with a bytes pattern.
+# splice_update() runs them over a buffer; apply_file mmaps files of at least
+# MMAP_MIN_BYTES and splices them through it. The steam pattern runs over the
+# whole buffer, so its whitespace must not cross lines the way \s could.
+BUFFER_UPDATERS = {
+    update_vencord: (
+        VENCORD_RULE._replace(
+            pattern=lazy_re(rb"--color(?P<key>\d{2})\s*:(?P<value>\s*#?[0-9A-Fa-f]{6};)")
+        ),
+        finish_vencord,
+    ),
+    update_steam: (
+        STEAM_RULES[0]._replace(
+            pattern=lazy_re(
+                rb"^[^\S\n]*(?P<key>--[A-Za-z0-9_-]+)[^\S\n]*:[^\S\n]*"
+                rb"(?P<value>\d+[^\S\n]*,[^\S\n]*\d+[^\S\n]*,[^\S\n]*\d+)",
+                re.MULTILINE,
+            )
+        ),
+        partial(finish_slots, STEAM_SLOTS),
+    ),
+}
 
-    with open(path, "w", encoding="utf-8") as f:
-        f.write(updated)
+# --template NAME -> the supported file rendered from templates/<file>, or
+# None for every supported file that has a template there.
+TEMPLATES = {
+    "all": None,
+    "gtk": "gtk.css",
+}
 
-    return report
+
+def scan_theme_files(project_root, recursive=False, templates=False):
+    """Return paths of supported files under project_root, in FORMATS order.
+
+    Each directory is listed with a single os.scandir pass. With recursive,
+    subdirectories follow in name order; hidden directories, symlinked
+    directories and templates/ are skipped. With templates, files that only
+    exist as templates/<file> are included too (their paths do not exist).
+    """
+    order = {filename: index for index, (filename, _) in enumerate(FORMATS)}
+    found = {}
+    subdirs = []
+    templates_dir = None
+    with os.scandir(project_root) as entries:
+        for entry in entries:
+            if entry.name in order:
+                if entry.is_file():
+                    found[entry.name] = entry.path
+            elif entry.name == "templates":
+                if templates and entry.is_dir():
+                    templates_dir = entry.path
+            elif recursive and entry.is_dir(follow_symlinks=False):
+                if not entry.name.startswith("."):
+                    subdirs.append(entry.path)
+    if templates_dir is not None:
+        with os.scandir(templates_dir) as entries:
+            for entry in entries:
+                if entry.name in order and entry.name not in found and entry.is_file():
+                    found[entry.name] = os.path.join(project_root, entry.name)
+
+    paths = [found[name] for name in sorted(found, key=order.get)]
+    for subdir in sorted(subdirs):
+        paths.extend(scan_theme_files(subdir, recursive=True, templates=templates))
+    return paths
+
+
+def build_jobs(project_root, template=None, recursive=False, appearances=None, template_cache=None):
+    # With template "all", a file with a templates/<file> is rendered from it
+    # (and created if need be); the rest keep their regex updater.
+    updaters = dict(FORMATS)
+    template_name = TEMPLATES[template] if template is not None else None
+    every = template is not None and template_name is None
+
+    jobs = []
+    for path in scan_theme_files(project_root, recursive, templates=every):
+        filename = os.path.basename(path)
+        update_fn = updaters[filename]
+        template_path = os.path.join(os.path.dirname(path), "templates", filename)
+        if filename == template_name or (every and os.path.isfile(template_path)):
+            update_fn = partial(
+                update_from_template, template_path=template_path, cache_dir=template_cache
+            )
+        elif appearances and update_fn is update_aether_zed:
+            update_fn = partial(update_aether_zed, appearances=appearances)
+        jobs.append((path, update_fn))
+    return jobs
+
+
+# Library API: the same pipeline as the CLI, without argv, cwd or printing.
+# Palette (above) is part of it.
+
+
+# The result of transform(): the updated text, its report entries and whether
+# anything changed.
+Transform = namedtuple("Transform", ["text", "report", "changed"])
+
+
+def transform(format_name, text, palette):
+    """Apply palette to text in the format of a supported file, e.g. "kitty.conf"."""
+    update_fn = dict(FORMATS).get(format_name)
+    if update_fn is None:
+        raise ValueError(f"Unknown format: {format_name}")
+    updated, report = update_fn(text, palette)
+    return Transform(updated, report, updated != text)
+
+
+def apply_to_directory(
+    root,
+    palette,
+    formats=None,
+    write=True,
+    template=None,
+    recursive=False,
+    workers=1,
+    sync=None,
+    appearances=None,
+):
+    """Apply palette to the supported files in root and return their FileReports.
+
+    formats limits the run to the given file names. With write=False nothing
+    is written and each FileReport's `written` is the size it would have had.
+    appearances maps a Zed theme's appearance ("light", "dark") to the
+    palette used for it instead.
+    """
+    jobs = build_jobs(root, template, recursive, appearances)
+    if formats is not None:
+        formats = set(formats)
+        unknown = formats - set(dict(FORMATS))
+        if unknown:
+            raise ValueError(f"Unknown formats: {', '.join(sorted(unknown))}")
+        jobs = [job for job in jobs if os.path.basename(job[0]) in formats]
+    if not write:
+        return preview_files(jobs, palette, workers=workers)
+    return apply_files(jobs, palette, workers=workers, sync=sync)
+
+
+def expand_schemes(patterns):
+    import glob
+
+    schemes = []
+    seen = set()
+    for pattern in patterns:
+        if any(ch in pattern for ch in "*?["):
+            matches = sorted(glob.glob(pattern))
+        else:
+            matches = [pattern]
+        for path in matches:
+            abs_path = os.path.abspath(path)
+            if abs_path not in seen:
+                seen.add(abs_path)
+                schemes.append(path)
+    return schemes
+
+
+def scheme_name(path):
+    return os.path.splitext(os.path.basename(path))[0]
+
+
+def expand_roots(patterns, paths_from=None):
+    import glob
+
+    entries = list(patterns)
+    if paths_from:
+        if paths_from == "-":
+            entries.extend(sys.stdin.read().splitlines())
+        else:
+            with open(paths_from, "r", encoding="utf-8") as f:
+                entries.extend(f.read().splitlines())
+
+    roots = []
+    seen = set()
+    for entry in entries:
+        entry = entry.strip()
+        if not entry:
+            continue
+        if any(ch in entry for ch in "*?["):
+            matches = sorted(path for path in glob.glob(entry) if os.path.isdir(path))
+        else:
+            matches = [entry]
+        for match in matches:
+            root = os.path.abspath(match)
+            if root not in seen:
+                seen.add(root)
+                roots.append(root)
+    return roots
+
+
+def theme_roots(args):
+    # The current directory only when no DIR and no --paths-from were given;
+    # patterns that match nothing are an error, not a cue to theme the cwd.
+    if not args.paths and not args.paths_from:
+        return [os.getcwd()]
+    roots = expand_roots(args.paths, args.paths_from)
+    if not roots:
+        given = list(args.paths)
+        if args.paths_from:
+            given.append(f"--paths-from {args.paths_from}")
+        print(f"No theme directories match: {', '.join(given)}", file=sys.stderr)
+    return roots
 
 
 def parse_args(argv):
     parser = argparse.ArgumentParser(description="Apply Base16 scheme to theme files.")
-    parser.add_argument("-s", "--scheme", required=True, help="Path to Base16 YAML scheme")
+    parser.add_argument(
+        "paths",
+        nargs="*",
+        metavar="DIR",
+        help="Theme directories or glob patterns to apply to (default: current directory)",
+    )
+    parser.add_argument(
+        "-s",
+        "--scheme",
+        action="append",
+        help="Path to Base16 YAML scheme (repeat or use a glob with --matrix)",
+    )
+    parser.add_argument(
+        "--light-scheme",
+        metavar="FILE",
+        help="Scheme for the light themes in aether.zed.json (default: -s)",
+    )
+    parser.add_argument(
+        "--dark-scheme",
+        metavar="FILE",
+        help="Scheme for the dark themes in aether.zed.json (default: -s)",
+    )
     parser.add_argument("-q", "--quiet", action="store_true", help="Suppress per-file reporting")
     parser.add_argument(
         "-t",
+        "--templates",
+        action="store_const",
+        const="all",
+        dest="template",
+        help="Render supported files from templates/<file> where one exists",
+    )
+    parser.add_argument(
         "--template",
-        nargs="?",
-        const="gtk",
-        choices=["gtk"],
-        help="Render supported files from templates (currently: gtk)",
+        choices=sorted(TEMPLATES),
+        help="Render only the named file from templates/ (all: same as -t)",
+    )
+    parser.add_argument(
+        "-j",
+        "--jobs",
+        type=int,
+        default=1,
+        metavar="N",
+        help="Apply files concurrently with N workers (0: one per CPU)",
+    )
+    parser.add_argument(
+        "-r",
+        "--recursive",
+        action="store_true",
+        help="Also apply to supported files in subdirectories of each theme directory",
+    )
+    parser.add_argument(
+        "--paths-from",
+        metavar="FILE",
+        help="Read additional theme directories from FILE, one per line ('-' for stdin)",
+    )
+    parser.add_argument(
+        "--no-scheme-cache",
+        action="store_true",
+        help="Parse the scheme and templates without reading or updating the on-disk caches",
+    )
+    parser.add_argument(
+        "--fsync",
+        choices=["file", "dir"],
+        help="Make writes durable: fsync every file and its directory, or fsync "
+        "files and each directory once at the end",
+    )
+    parser.add_argument(
+        "--manifest",
+        metavar="FILE",
+        help="Record applied files in FILE and skip files unchanged since the last run",
+    )
+    parser.add_argument(
+        "--matrix",
+        metavar="OUT_DIR",
+        help="Render every scheme into OUT_DIR/<scheme>/<theme dir>/ instead of in place",
+    )
+    parser.add_argument(
+        "-n",
+        "--dry-run",
+        action="store_true",
+        help="Report what would change without writing any file",
+    )
+    parser.add_argument(
+        "--diff",
+        action="store_true",
+        help="Print a unified diff of what would change instead of a report (implies --dry-run)",
     )
-    return parser.parse_args(argv)
+    parser.add_argument(
+        "-w",
+        "--watch",
+        action="store_true",
+        help="Keep running and re-apply when the scheme or a theme file changes",
+    )
+    parser.add_argument(
+        "--daemon",
+        metavar="SOCKET",
+        help="Serve apply requests on a UNIX socket instead of applying once",
+    )
+    parser.add_argument(
+        "--socket",
+        metavar="SOCKET",
+        help="Send this apply to the daemon listening on SOCKET",
+    )
+    parser.add_argument(
+        "--report-format",
+        choices=["text", "json", "ndjson"],
+        default="text",
+        help="Report as text (colour swatches only on a terminal), a JSON array, "
+        "or one JSON object per line",
+    )
+    parser.add_argument(
+        "--timings",
+        action="store_const",
+        const="table",
+        help="Print per-stage and per-file durations to stderr as a table",
+    )
+    parser.add_argument(
+        "--timings-format",
+        choices=["table", "json"],
+        dest="timings",
+        help="Print the --timings durations in this format instead",
+    )
+    parser.add_argument(
+        "--profile",
+        metavar="FILE",
+        help="Run under cProfile and write the stats to FILE (main thread only)",
+    )
+    args = parser.parse_args(argv)
+    if args.daemon:
+        others = [args.scheme, args.paths, args.paths_from, args.socket, args.matrix]
+        others += [args.manifest, args.watch, args.dry_run, args.diff, args.template]
+        others += [args.light_scheme, args.dark_scheme]
+        if any(others):
+            parser.error("--daemon takes only -j, --fsync, --no-scheme-cache and -q")
+    elif not args.scheme:
+        parser.error("the following arguments are required: -s/--scheme")
+    elif args.socket and any([args.matrix, args.manifest, args.watch, args.dry_run, args.diff]):
+        parser.error("--socket cannot be combined with --matrix, --manifest, --watch or --dry-run")
+    if args.scheme and len(args.scheme) > 1 and not args.matrix:
+        parser.error("multiple schemes require --matrix")
+    if (args.light_scheme or args.dark_scheme) and (args.matrix or args.socket):
+        parser.error("--light-scheme/--dark-scheme cannot be combined with --matrix or --socket")
+    if args.diff:
+        args.dry_run = True
+    if args.dry_run and args.matrix:
+        parser.error("--dry-run/--diff cannot be combined with --matrix")
+    if args.watch and (args.matrix or args.dry_run):
+        parser.error("--watch cannot be combined with --matrix, --dry-run or --diff")
+    if args.jobs <= 0:
+        args.jobs = os.cpu_count() or 1
+    return args
+
+
+def print_reports(groups, color=True):
+    for header, root, entries in groups:
+        if header is not None:
+            print(f"### {header}")
+        for path, report, _ in entries:
+            print(f"==> {os.path.relpath(path, root)}")
+            if report:
+                for entry in report:
+                    print(f"  - {format_report_line(entry) if color else entry}")
+            else:
+                print("  - no matches")
+
+
+def report_record(root, result, stages=None):
+    # Report entries are "<key> -> <value>", Missing entries or free-form notes
+    # (e.g. a skipped gradient); split them without re-scanning for colours.
+    # Missing entries summarise their keys for text reports, so list the keys
+    # they carry rather than the summary.
+    replaced = {}
+    missing = []
+    notes = []
+    for entry in result.report:
+        if isinstance(entry, Missing):
+            missing.extend(entry.keys)
+        elif entry.startswith("missing "):
+            # Reports kept from before Missing entries carried their keys.
+            missing.append(entry[len("missing ") :])
+        else:
+            key, sep, value = entry.partition(" -> ")
+            if sep:
+                replaced[key] = value
+            else:
+                notes.append(entry)
+
+    record = {
+        "path": os.path.abspath(result.path),
+        "root": root,
+        "replaced": replaced,
+        "missing": missing,
+        "notes": notes,
+        "changed": result.written > 0,
+        "written_bytes": result.written,
+    }
+    if stages is not None:
+        record["timings"] = stages
+    return record
+
+
+def print_structured_reports(groups, fmt="json", timings=None):
+    import json
+
+    stages_by_path = dict(timings or ())
+    records = [
+        report_record(root, result, stages_by_path.get(result.path))
+        for _, root, entries in groups
+        for result in entries
+    ]
+    if fmt == "ndjson":
+        sys.stdout.write("".join(json.dumps(record) + "\n" for record in records))
+    else:
+        sys.stdout.write(json.dumps(records, indent=2) + "\n")
+
+
+def report_groups(batches, results):
+    # Split a flat list of FileReports back into one group per theme directory.
+    results = iter(results)
+    return [
+        (root if len(batches) > 1 else None, root, [next(results) for _ in root_jobs])
+        for root, root_jobs in batches
+    ]
+
+
+def emit_reports(args, groups, timings=None):
+    with timed("report"):
+        if args.report_format == "text":
+            print_reports(groups, color=sys.stdout.isatty())
+        else:
+            print_structured_reports(groups, args.report_format, timings)
+    sys.stdout.flush()
+
+
+class InotifyWatcher(object):
+    """Block until something changes in a set of directories, via inotify(7)."""
+
+    # IN_CLOSE_WRITE | IN_MOVED_FROM | IN_MOVED_TO | IN_CREATE | IN_DELETE
+    MASK = 0x008 | 0x040 | 0x080 | 0x100 | 0x200
+
+    def __init__(self):
+        import ctypes
+        import ctypes.util
+
+        libc = ctypes.CDLL(ctypes.util.find_library("c"), use_errno=True)
+        self.add_watch = libc.inotify_add_watch
+        self.add_watch.argtypes = [ctypes.c_int, ctypes.c_char_p, ctypes.c_uint32]
+        self.fd = libc.inotify_init1(os.O_CLOEXEC)
+        if self.fd < 0:
+            raise OSError(ctypes.get_errno(), "inotify_init1 failed")
+        self.watched = set()
+
+    def watch(self, directories):
+        for directory in set(directories) - self.watched:
+            if self.add_watch(self.fd, os.fsencode(directory), self.MASK) >= 0:
+                self.watched.add(directory)
+
+    def wait(self, timeout=None):
+        import select
+
+        if not select.select([self.fd], [], [], timeout)[0]:
+            return False
+        # Let a burst of events (an editor's save, our own writes) settle.
+        while select.select([self.fd], [], [], WATCH_DEBOUNCE)[0]:
+            os.read(self.fd, 64 * 1024)
+        return True
+
+    def close(self):
+        os.close(self.fd)
+
+
+class PollingWatcher(object):
+    """Fallback for platforms without inotify: callers compare mtimes."""
+
+    def watch(self, directories):
+        pass
+
+    def wait(self, timeout=None):
+        time.sleep(WATCH_POLL_INTERVAL if timeout is None else min(timeout, WATCH_POLL_INTERVAL))
+        return True
+
+    def close(self):
+        pass
+
+
+def make_watcher():
+    if sys.platform.startswith("linux"):
+        try:
+            return InotifyWatcher()
+        except (OSError, AttributeError, TypeError):
+            pass
+    return PollingWatcher()
+
+
+def file_state(path):
+    try:
+        info = os.stat(path)
+    except OSError:
+        return None
+    return info.st_mtime_ns, info.st_size, info.st_ino
+
+
+def job_inputs(path, update_fn):
+    # Template-rendered files also depend on their template.
+    template_path = template_path_of(update_fn)
+    if template_path is not None:
+        return [path, template_path]
+    return [path]
+
+
+def watch(args, roots, scheme_path, palette, cache_dir=None, manifest=None, appearances=None):
+    """Re-apply whenever the scheme or a theme file changes, until interrupted.
+
+    A change to the scheme (or the --light-scheme/--dark-scheme file)
+    re-applies every file; a theme file (or template) change re-applies just
+    that file. Palette and compiled rules stay loaded between passes, and
+    files this process writes are not treated as changes. A pass that fails
+    (a half-written file, a file deleted mid-pass, a broken scheme) is
+    reported on stderr and the next change is picked up as usual.
+    """
+
+    template_cache = None if args.no_scheme_cache else template_cache_dir()
+    if appearances is None:
+        appearances = {}
+    # (path, appearance) of every scheme; None is the -s scheme.
+    schemes = [(scheme_path, None)]
+    for appearance, path in (("light", args.light_scheme), ("dark", args.dark_scheme)):
+        if path:
+            schemes.append((path, appearance))
+
+    def collect():
+        batches = [
+            (root, build_jobs(root, args.template, args.recursive, appearances, template_cache))
+            for root in roots
+        ]
+        states = {path: file_state(path) for path, _ in schemes}
+        for _, root_jobs in batches:
+            for job in root_jobs:
+                for path in job_inputs(*job):
+                    states[path] = file_state(path)
+        return batches, states
+
+    watcher = make_watcher()
+    _, states = collect()
+    if not args.quiet:
+        watched = ", ".join(path for path, _ in schemes)
+        print(
+            f"Watching {watched} and {len(states) - len(schemes)} theme files (Ctrl-C to stop)",
+            file=sys.stderr,
+        )
+    try:
+        while True:
+            watcher.watch([os.path.dirname(os.path.abspath(path)) for path in states] + roots)
+            if not watcher.wait():
+                continue
+            # OSError and ValueError (which covers UnicodeDecodeError and
+            # json.JSONDecodeError) only end this pass, never the watch.
+            try:
+                batches, current = collect()
+                changed = {path for path, state in current.items() if states.get(path) != state}
+                states = current
+                if not changed:
+                    continue
+
+                reloaded = False
+                for path, appearance in schemes:
+                    if path not in changed:
+                        continue
+                    loaded = load_scheme(path, cache_dir)[1]
+                    if appearance is None:
+                        palette = loaded
+                    else:
+                        appearances[appearance] = loaded
+                    reloaded = True
+                if not reloaded:
+                    batches = [
+                        (root, [job for job in root_jobs if changed.intersection(job_inputs(*job))])
+                        for root, root_jobs in batches
+                    ]
+                    batches = [(root, root_jobs) for root, root_jobs in batches if root_jobs]
+
+                jobs = [job for _, root_jobs in batches for job in root_jobs]
+                try:
+                    results = apply_files(
+                        jobs, palette, workers=args.jobs, manifest=manifest, sync=args.fsync
+                    )
+                finally:
+                    # Our own writes show up as changes on the next pass;
+                    # absorb them, including those of a pass that failed.
+                    for path, _ in jobs:
+                        states[path] = file_state(path)
+                if manifest is not None:
+                    save_manifest(args.manifest, manifest, sync=args.fsync)
+            except (OSError, ValueError) as exc:
+                print(str(exc), file=sys.stderr)
+                continue
+            if not args.quiet:
+                emit_reports(args, report_groups(batches, results))
+    except KeyboardInterrupt:
+        return 0
+    finally:
+        watcher.close()
+
+
+class DirectoryQueue(object):
+    """Applies requests for one directory one at a time.
+
+    Requests that arrive while an apply is queued or running are coalesced:
+    only the newest is applied, and every caller waiting on the merged
+    requests gets its result.
+    """
+
+    def __init__(self, apply):
+        self.apply = apply
+        self.lock = threading.Lock()
+        self.pending = None
+        self.futures = []
+        self.busy = False
+
+    def submit(self, request):
+        from concurrent.futures import Future
+
+        future = Future()
+        with self.lock:
+            self.pending = request
+            self.futures.append(future)
+            if not self.busy:
+                self.busy = True
+                threading.Thread(target=self.drain, daemon=True).start()
+        return future
+
+    def drain(self):
+        while True:
+            time.sleep(DAEMON_COALESCE)
+            with self.lock:
+                request, futures = self.pending, self.futures
+                self.pending, self.futures = None, []
+                if request is None:
+                    self.busy = False
+                    return
+            try:
+                result = self.apply(request)
+            except Exception as exc:
+                for future in futures:
+                    future.set_exception(exc)
+            else:
+                for future in futures:
+                    future.set_result(result)
+
+
+class ThemeDaemon(object):
+    """Serve apply requests over a UNIX socket, one JSON object per line.
+
+    A request names the theme directories in "paths" and either a "scheme"
+    file or an inline "palette" of base00-base0F colours, plus optional
+    "template" and "recursive". The reply is {"ok": true, "results": [{"root",
+    "files": [{"path", "report", "written"}]}]} or {"ok": false, "error"}, where
+    missing entries in "report" are [entry, [key, ...]] pairs.
+    Parsed schemes stay in memory, keyed on path, size and mtime.
+    """
+
+    def __init__(self, workers=1, sync=None, cache_dir=None, quiet=False):
+        self.workers = workers
+        self.sync = sync
+        self.cache_dir = cache_dir
+        self.quiet = quiet
+        self.lock = threading.Lock()
+        self.queues = {}
+        self.schemes = {}
+
+    def palette_for(self, request):
+        if "palette" in request:
+            return Palette.from_base16(request["palette"])
+        if "scheme" not in request:
+            raise ValueError('Request needs a "scheme" file or a "palette"')
+
+        path = os.path.abspath(request["scheme"])
+        try:
+            info = os.stat(path)
+        except FileNotFoundError:
+            raise FileNotFoundError(f"Scheme file not found: {path}") from None
+        key = (info.st_size, info.st_mtime_ns)
+        with self.lock:
+            cached = self.schemes.get(path)
+        if cached is not None and cached[0] == key:
+            return cached[1]
+        palette = load_scheme(path, self.cache_dir)[1]
+        with self.lock:
+            self.schemes[path] = (key, palette)
+        return palette
+
+    def queue_for(self, root):
+        with self.lock:
+            queue = self.queues.get(root)
+            if queue is None:
+                queue = self.queues[root] = DirectoryQueue(partial(self.apply, root))
+            return queue
+
+    def apply(self, root, request):
+        palette, template, recursive = request
+        jobs = build_jobs(root, template, recursive)
+        results = apply_files(jobs, palette, workers=self.workers, sync=self.sync)
+        if not self.quiet:
+            written = sum(1 for result in results if result.written)
+            print(f"{root}: {len(jobs)} files, {written} written", file=sys.stderr)
+        return results
+
+    def handle(self, request):
+        template = request.get("template")
+        if template is not None and template not in TEMPLATES:
+            raise ValueError(f"Unknown template: {template}")
+        paths = request.get("paths")
+        if not paths:
+            raise ValueError("Request has no paths")
+        if not isinstance(paths, list) or not all(isinstance(path, str) for path in paths):
+            raise ValueError('"paths" must be a list of strings')
+        roots = [os.path.abspath(path) for path in paths]
+        for root in roots:
+            if not os.path.isdir(root):
+                raise FileNotFoundError(f"Theme directory not found: {root}")
+
+        palette = self.palette_for(request)
+        job = (palette, template, bool(request.get("recursive")))
+        futures = [(root, self.queue_for(root).submit(job)) for root in roots]
+        results = []
+        for root, future in futures:
+            files = [
+                {"path": path, "report": dump_report(report), "written": written}
+                for path, report, written in future.result()
+            ]
+            results.append({"root": root, "files": files})
+        return {"ok": True, "results": results}
+
+    def handle_line(self, line):
+        import json
+
+        try:
+            request = json.loads(line)
+            if not isinstance(request, dict):
+                raise ValueError("Request must be a JSON object")
+            reply = self.handle(request)
+        except (OSError, ValueError, KeyError, TypeError) as exc:
+            reply = {"ok": False, "error": str(exc)}
+        return (json.dumps(reply) + "\n").encode("utf-8")
+
+    def serve(self, socket_path):
+        import signal
+        import socket
+        import socketserver
+
+        daemon = self
+
+        def terminate(signum, frame):
+            raise KeyboardInterrupt
+
+        class Handler(socketserver.StreamRequestHandler):
+            def handle(self):
+                for line in self.rfile:
+                    if line.strip():
+                        self.wfile.write(daemon.handle_line(line))
+
+        if os.path.lexists(socket_path):
+            # Only ever remove a stale socket, never whatever else is there.
+            if not stat.S_ISSOCK(os.lstat(socket_path).st_mode):
+                raise OSError(f"{socket_path}: path exists and is not a socket")
+            probe = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+            try:
+                probe.connect(socket_path)
+            except OSError:
+                os.unlink(socket_path)
+            else:
+                raise OSError(f"A daemon is already listening on {socket_path}")
+            finally:
+                probe.close()
+
+        # The socket applies themes as this user; keep it private.
+        umask = os.umask(0o077)
+        try:
+            server = socketserver.ThreadingUnixStreamServer(socket_path, Handler)
+        finally:
+            os.umask(umask)
+        server.daemon_threads = True
+        if not self.quiet:
+            print(f"Listening on {socket_path}", file=sys.stderr)
+        # Stop on SIGTERM the same way as on Ctrl-C, removing the socket.
+        previous = signal.signal(signal.SIGTERM, terminate)
+        try:
+            server.serve_forever()
+        except KeyboardInterrupt:
+            pass
+        finally:
+            signal.signal(signal.SIGTERM, previous)
+            server.server_close()
+            try:
+                os.unlink(socket_path)
+            except FileNotFoundError:
+                pass
+        return 0
+
+
+def request_daemon(socket_path, request):
+    import json
+    import socket
+
+    with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as sock:
+        sock.connect(socket_path)
+        sock.sendall(json.dumps(request).encode("utf-8") + b"\n")
+        sock.shutdown(socket.SHUT_WR)
+        with sock.makefile("rb") as f:
+            reply = f.readline()
+    if not reply:
+        raise OSError(f"No reply from {socket_path}")
+    return json.loads(reply)
+
+
+def run_client(args, roots):
+    request = {
+        "scheme": os.path.abspath(args.scheme[0]),
+        "paths": roots,
+        "template": args.template,
+        "recursive": args.recursive,
+    }
+    try:
+        reply = request_daemon(args.socket, request)
+    except OSError as exc:
+        print(f"Cannot reach daemon at {args.socket}: {exc}", file=sys.stderr)
+        return 1
+    if not reply["ok"]:
+        print(reply["error"], file=sys.stderr)
+        return 1
+
+    results = reply["results"]
+    if not args.quiet:
+        groups = [
+            (
+                result["root"] if len(results) > 1 else None,
+                result["root"],
+                [
+                    FileReport(entry["path"], load_report(entry["report"]), entry["written"])
+                    for entry in result["files"]
+                ],
+            )
+            for result in results
+        ]
+        emit_reports(args, groups)
+        if args.report_format == "text":
+            print("Done.")
+    return 0
+
+
+def print_timings(stages, files, fmt="table"):
+    # Written to stderr so timings never mix with the per-file reports.
+    if fmt == "json":
+        import json
+
+        data = {
+            "stages": stages,
+            "files": [dict(path=path, **file_stages) for path, file_stages in files],
+        }
+        print(json.dumps(data, indent=2), file=sys.stderr)
+        return
+
+    print(f"{'stage':<24}{'ms':>10}", file=sys.stderr)
+    for stage, ns in stages.items():
+        print(f"{stage:<24}{ns / 1e6:>10.3f}", file=sys.stderr)
+    if not files:
+        return
+    columns = [
+        stage
+        for stage in ("read", "hash", "update", "diff", "write", "total")
+        if any(stage in file_stages for _, file_stages in files)
+    ]
+    names = [os.path.relpath(path) for path, _ in files]
+    width = max(len("file"), *map(len, names)) + 2
+    print(f"\n{'file':<{width}}" + "".join(f"{stage:>10}" for stage in columns), file=sys.stderr)
+    for name, (_, file_stages) in zip(names, files):
+        cells = "".join(f"{file_stages.get(stage, 0) / 1e6:>10.3f}" for stage in columns)
+        print(f"{name:<{width}}{cells}", file=sys.stderr)
 
 
 def main(argv):
     args = parse_args(argv)
+    files = [] if args.timings or args.report_format != "text" else None
+    with recording_timings() if args.timings else nullcontext({}) as stages:
+        with timed("total"):
+            if args.profile:
+                import cProfile
+
+                profiler = cProfile.Profile()
+                try:
+                    status = profiler.runcall(run, args, files)
+                finally:
+                    profiler.dump_stats(args.profile)
+            else:
+                status = run(args, files)
+    if args.timings:
+        print_timings(stages, files, args.timings)
+    return status
+
+
+def run(args, timings=None):
+    if args.daemon:
+        cache_dir = None if args.no_scheme_cache else scheme_cache_dir()
+        daemon = ThemeDaemon(
+            workers=args.jobs, sync=args.fsync, cache_dir=cache_dir, quiet=args.quiet
+        )
+        try:
+            return daemon.serve(args.daemon)
+        except OSError as exc:
+            print(str(exc), file=sys.stderr)
+            return 1
+    if args.socket:
+        roots = theme_roots(args)
+        if not roots:
+            return 1
+        return run_client(args, roots)
+
+    scheme_paths = expand_schemes(args.scheme) if args.matrix else args.scheme
+    if not scheme_paths:
+        print(f"No scheme files match: {', '.join(args.scheme)}", file=sys.stderr)
+        return 1
+    names = matrix_output_names(scheme_paths, scheme_name)
+    cache_dir = None if args.no_scheme_cache else scheme_cache_dir()
     try:
-        base16 = load_base16(args.scheme)
+        with timed("scheme"):
+            schemes = [(names[path], load_scheme(path, cache_dir)[1]) for path in scheme_paths]
+            appearances = {
+                appearance: load_scheme(path, cache_dir)[1]
+                for appearance, path in (("light", args.light_scheme), ("dark", args.dark_scheme))
+                if path
+            }
     except FileNotFoundError as exc:
         print(str(exc), file=sys.stderr)
         return 1
-    palette = build_palette(base16)
-
-    project_root = os.getcwd()
-    gtk_template_path = os.path.join(project_root, "templates", "gtk.css")
-    ghostty_path = os.path.join(project_root, "ghostty.conf")
-    neovim_path = os.path.join(project_root, "neovim.lua")
-    alacritty_path = os.path.join(project_root, "alacritty.toml")
-    kitty_path = os.path.join(project_root, "kitty.conf")
-    warp_path = os.path.join(project_root, "warp.yaml")
-    colors_fish_path = os.path.join(project_root, "colors.fish")
-    fzf_path = os.path.join(project_root, "fzf.fish")
-    vencord_path = os.path.join(project_root, "vencord.theme.css")
-    hyprland_path = os.path.join(project_root, "hyprland.conf")
-    hyprlock_path = os.path.join(project_root, "hyprlock.conf")
-    mako_path = os.path.join(project_root, "mako.ini")
-    waybar_path = os.path.join(project_root, "waybar.css")
-    wofi_path = os.path.join(project_root, "wofi.css")
-    walker_path = os.path.join(project_root, "walker.css")
-    swayosd_path = os.path.join(project_root, "swayosd.css")
-    btop_path = os.path.join(project_root, "btop.theme")
-    cava_path = os.path.join(project_root, "cava_theme")
-    chromium_path = os.path.join(project_root, "chromium.theme")
-    gtk_path = os.path.join(project_root, "gtk.css")
-    aether_override_path = os.path.join(project_root, "aether.override.css")
-    steam_path = os.path.join(project_root, "steam.css")
-    zed_path = os.path.join(project_root, "aether.zed.json")
-
-    gtk_update = update_gtk_css
-    if args.template == "gtk":
-        gtk_update = lambda contents, palette: update_gtk_template(
-            contents, palette, gtk_template_path
-        )
 
-    reports = [
-        (ghostty_path, apply_file(ghostty_path, update_ghostty, palette)),
-        (neovim_path, apply_file(neovim_path, update_neovim, palette)),
-        (alacritty_path, apply_file(alacritty_path, update_alacritty, palette)),
-        (kitty_path, apply_file(kitty_path, update_kitty, palette)),
-        (warp_path, apply_file(warp_path, update_warp, palette)),
-        (colors_fish_path, apply_file(colors_fish_path, update_colors_fish, palette)),
-        (fzf_path, apply_file(fzf_path, update_fzf_fish, palette)),
-        (vencord_path, apply_file(vencord_path, update_vencord, palette)),
-        (hyprland_path, apply_file(hyprland_path, update_hyprland, palette)),
-        (hyprlock_path, apply_file(hyprlock_path, update_hyprlock, palette)),
-        (mako_path, apply_file(mako_path, update_mako, palette)),
-        (waybar_path, apply_file(waybar_path, update_waybar, palette)),
-        (wofi_path, apply_file(wofi_path, update_wofi, palette)),
-        (walker_path, apply_file(walker_path, update_walker, palette)),
-        (swayosd_path, apply_file(swayosd_path, update_swayosd, palette)),
-        (btop_path, apply_file(btop_path, update_btop, palette)),
-        (cava_path, apply_file(cava_path, update_cava, palette)),
-        (chromium_path, apply_file(chromium_path, update_chromium, palette)),
-        (gtk_path, apply_file(gtk_path, gtk_update, palette)),
-        (aether_override_path, apply_file(aether_override_path, update_aether_override, palette)),
-        (steam_path, apply_file(steam_path, update_steam, palette)),
-        (zed_path, apply_file(zed_path, update_aether_zed, palette)),
-    ]
+    roots = theme_roots(args)
+    if not roots:
+        return 1
+    not_dirs = [root for root in roots if not os.path.isdir(root)]
+    if not_dirs:
+        for root in not_dirs:
+            print(f"Theme directory not found: {root}", file=sys.stderr)
+        return 1
 
-    if not args.quiet:
-        for path, report in reports:
-            print(f"==> {os.path.basename(path)}")
-            if report:
-                for entry in report:
-                    print(f"  - {format_report_line(entry)}")
+    template_cache = None if args.no_scheme_cache else template_cache_dir()
+    with timed("scan"):
+        batches = [
+            (root, build_jobs(root, args.template, args.recursive, appearances, template_cache))
+            for root in roots
+        ]
+    for root, root_jobs in batches:
+        if not root_jobs:
+            print(f"No supported theme files in {root}", file=sys.stderr)
+    if args.matrix:
+        with timed("apply"):
+            groups = render_matrix(
+                batches, schemes, args.matrix, workers=args.jobs, sync=args.fsync, timings=timings
+            )
+    else:
+        palette = schemes[0][1]
+        jobs = [job for _, root_jobs in batches for job in root_jobs]
+        manifest = None
+        if args.manifest and not args.dry_run:
+            with timed("manifest"):
+                manifest = load_manifest(args.manifest)
+        with timed("apply"):
+            if args.dry_run:
+                results = preview_files(
+                    jobs,
+                    palette,
+                    workers=args.jobs,
+                    diff=sys.stdout if args.diff else None,
+                    timings=timings,
+                )
             else:
-                print("  - no matches")
-
-        print("Done.")
+                results = apply_files(
+                    jobs,
+                    palette,
+                    workers=args.jobs,
+                    manifest=manifest,
+                    sync=args.fsync,
+                    timings=timings,
+                )
+        if manifest is not None:
+            with timed("manifest"):
+                save_manifest(args.manifest, manifest, sync=args.fsync)
+        groups = report_groups(batches, results)
+
+    if not args.quiet and not args.diff:
+        emit_reports(args, groups, timings)
+        if args.report_format == "text":
+            print("Done (dry run, no files written)." if args.dry_run else "Done.")
+    if args.watch:
+        return watch(args, roots, scheme_paths[0], schemes[0][1], cache_dir, manifest, appearances)
     return 0
 
 